@@ -0,0 +1,106 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# access tokens live 15 minutes; edits invalidate the entry right away anyway
+AUTH_USER_CACHE_TIMEOUT = getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 5 * 60)
+AUTH_USER_CACHE_ALIAS = getattr(settings, "AUTH_USER_CACHE_ALIAS", "default")
+
+# A per-process cache cannot be invalidated from the worker that saved the user,
+# so the other workers would keep authenticating a deactivated user.
+LOCAL_BACKENDS = (LocMemCache,)
+
+# Only what authentication and permission checks read; everything else (and the
+# password hash) stays deferred and is loaded from the database on first access.
+AUTH_FIELDS = ("id", "username", "email", "is_active", "is_staff", "is_superuser")
+
+
+def user_cache():
+    """The shared cache for authenticated users, or None when the backend is process-local."""
+    backend = caches[AUTH_USER_CACHE_ALIAS]
+    return None if isinstance(backend, LOCAL_BACKENDS) else backend
+
+
+def version_key(user_id):
+    return f"auth-user:{user_id}:version"
+
+
+def current_version(cache, user_id):
+    # a missing token is recreated from the clock, so entries stored under an older one never match
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def cache_key(user_id, version):
+    return f"auth-user:{user_id}:{version}"
+
+
+def invalidate(user_id):
+    cache = user_cache()
+    if cache is None:
+        return
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        cache.add(version_key(user_id), time.time_ns(), None)
+
+
+def dump(user):
+    data = {field: getattr(user, field) for field in AUTH_FIELDS}
+    if api_settings.CHECK_REVOKE_TOKEN:
+        data["password_digest"] = get_md5_hash_password(user.password)
+    return data
+
+
+def load(data):
+    fields = [field.attname for field in User._meta.concrete_fields if field.attname in AUTH_FIELDS]
+    return User.from_db(router.db_for_read(User), fields, [data[field] for field in fields])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the user from a shared cache instead of querying
+    auth_user on every request. Entries are keyed by a per-user version that is bumped
+    whenever the user is saved or deleted (password reset, deactivation, profile edits),
+    see core/signals.py.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        cache = user_cache()
+        if cache is None:
+            return super().get_user(validated_token)
+
+        # read the version before the row, so a save in between leaves this entry unreachable
+        key = cache_key(user_id, current_version(cache, user_id))
+        data = cache.get(key)
+        if data is None:
+            user = super().get_user(validated_token)
+            cache.set(key, dump(user), AUTH_USER_CACHE_TIMEOUT)
+            return user
+
+        # the cached row is still checked like a fresh one
+        if api_settings.CHECK_USER_IS_ACTIVE and not data["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != data.get("password_digest"):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return load(data)
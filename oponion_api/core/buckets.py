@@ -0,0 +1,88 @@
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import DailyTimeBucket
+from .rollups import day_bounds, is_closed, user_timezone
+
+BucketKey = namedtuple("BucketKey", "user_id project_id task_id date")
+
+
+def split_by_day(start_time, end_time, tz):
+    """Yield (local date, duration) for every local day the span touches."""
+    day = start_time.astimezone(tz).date()
+    while True:
+        day_start, next_start = day_bounds(day, tz)
+        if day_start >= end_time:
+            return
+        yield day, min(end_time, next_start) - max(start_time, day_start)
+        day += timedelta(days=1)
+
+
+def add_to_bucket(key, duration, entries):
+    buckets = DailyTimeBucket.objects.filter(**key)
+    changes = {"duration": F("duration") + duration, "entries": F("entries") + entries}
+    if buckets.update(**changes) or duration < timedelta(0):
+        # removals never create rows; the bucket may be going away in the same cascade
+        return
+    try:
+        with transaction.atomic():
+            DailyTimeBucket.objects.create(**key, duration=duration, entries=entries)
+    except IntegrityError:
+        # created concurrently between our UPDATE and INSERT
+        buckets.update(**changes)
+
+
+def apply_span(span, sign=1):
+    """Add (sign=1) or remove (sign=-1) a closed time span from the daily buckets."""
+    apply_spans([span], sign)
+
+
+def apply_spans(spans, sign=1):
+    totals = bucket_totals(spans)
+    if sign > 0 and len(totals) > 1:
+        totals = create_missing_buckets(totals)
+    for key, (duration, entries) in totals.items():
+        add_to_bucket(key._asdict(), duration * sign, entries * sign)
+
+
+def create_missing_buckets(totals):
+    """Insert all not yet existing buckets with one INSERT; returns the totals still to be added."""
+    keys = list(totals)
+    existing = DailyTimeBucket.objects.filter(
+        user_id__in={key.user_id for key in keys},
+        project_id__in={key.project_id for key in keys},
+        date__range=(min(key.date for key in keys), max(key.date for key in keys)),
+    ).values_list("user_id", "project_id", "task_id", "date")
+    existing = {BucketKey(*row) for row in existing}
+    missing = [key for key in keys if key not in existing]
+
+    try:
+        with transaction.atomic():
+            DailyTimeBucket.objects.bulk_create([
+                DailyTimeBucket(**key._asdict(), duration=totals[key][0], entries=totals[key][1])
+                for key in missing
+            ])
+    except IntegrityError:
+        # a concurrent writer created some of them; fall back to one upsert per bucket
+        return totals
+    return {key: value for key, value in totals.items() if key in existing}
+
+
+def bucket_totals(spans, totals=None, timezones=None):
+    """Accumulate closed spans into {bucket key: [duration, entries]}."""
+    totals = defaultdict(lambda: [timedelta(0), 0]) if totals is None else totals
+    timezones = {} if timezones is None else timezones
+    for span in spans:
+        if not is_closed(span):
+            continue
+        if span.user_id not in timezones:
+            timezones[span.user_id] = user_timezone(span.user_id)
+        days = split_by_day(span.start_time, span.end_time, timezones[span.user_id])
+        for index, (day, duration) in enumerate(days):
+            bucket = totals[BucketKey(span.user_id, span.project_id, span.task_id, day)]
+            bucket[0] += duration
+            bucket[1] += index == 0
+    return totals
@@ -0,0 +1,57 @@
+import hashlib
+
+from django.db.models import Count, Max, Value
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+from . import metrics
+
+
+def scope_etag(request, querysets, extra=()):
+    """
+    Weak validator for a user-scoped read: the newest updated_at plus the row count of
+    every queryset the response is built from. Deletions change the count, any write
+    changes updated_at, so two aggregate queries replace the full serialization.
+    """
+    states = [
+        queryset.order_by()
+        .annotate(scope=Value(index))
+        .values("scope")
+        .annotate(last=Max("updated_at"), count=Count("pk", distinct=True))
+        .values_list("scope", "last", "count")
+        for index, queryset in enumerate(querysets)
+    ]
+    # one round trip for all scopes
+    rows = sorted(states[0].union(*states[1:], all=True)) if len(states) > 1 else list(states[0])
+
+    parts = [str(request.user.pk), request.path, request.META.get("QUERY_STRING", ""), *extra]
+    parts += [f"{scope}:{last}:{count}" for scope, last, count in rows]
+    return 'W/"%s"' % hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def conditional_get(request, name, querysets, build, extra=()):
+    etag = scope_etag(request, querysets, extra)
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match and matches(etag, if_none_match):
+        metrics.incr(f"etag.{name}.hit")
+        return Response(status=304, headers={"ETag": etag})
+
+    metrics.incr(f"etag.{name}.miss")
+    response = build()
+    if response.status_code == 200:
+        response["ETag"] = etag
+    return response
+
+
+def matches(etag, if_none_match):
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    return etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in parse_etags(if_none_match)}
+
+
+def quarter_hour():
+    # today_time resets at each creator's local midnight; every UTC offset is a multiple of 15 minutes
+    now = timezone.now()
+    return (f"{now:%Y-%m-%dT%H}:{now.minute // 15}",)
@@ -0,0 +1,47 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+
+from .models import UserImage
+
+ImageRef = namedtuple("ImageRef", "sha256 variant_sizes")
+
+DISPLAY_INFO_TIMEOUT = getattr(settings, "DISPLAY_INFO_CACHE_TIMEOUT", 60 * 60)
+
+
+def cache_key(user_id):
+    return f"display-info:{user_id}"
+
+
+def display_info(user_ids):
+    """
+    user id -> {"id", "username", "email", "profile_image": ImageRef | None} for every
+    existing user. Cache misses are filled with a single query.
+    """
+    keys = {cache_key(user_id): user_id for user_id in user_ids}
+    cached = cache.get_many(keys)
+    found = {keys[key]: info for key, info in cached.items()}
+
+    missing = [user_id for user_id in user_ids if user_id not in found]
+    if missing:
+        latest = UserImage.objects.filter(user=OuterRef("pk"), type="profile").order_by("-id")
+        users = User.objects.filter(id__in=missing).annotate(
+            image_sha256=Subquery(latest.values("sha256")[:1]),
+            image_variants=Subquery(latest.values("variant_sizes")[:1]),
+        ).values("id", "username", "email", "image_sha256", "image_variants")
+
+        fresh = {}
+        for row in users:
+            image = ImageRef(row["image_sha256"], row["image_variants"] or []) if row["image_sha256"] else None
+            fresh[row["id"]] = {"id": row["id"], "username": row["username"], "email": row["email"], "profile_image": image}
+        cache.set_many({cache_key(user_id): info for user_id, info in fresh.items()}, DISPLAY_INFO_TIMEOUT)
+        found.update(fresh)
+
+    return found
+
+
+def invalidate(user_id):
+    cache.delete(cache_key(user_id))
@@ -0,0 +1,85 @@
+import csv
+import json
+
+from django.db.models import Q
+
+from .models import ProjectTimeEntry, Shift, TaskTimeEntry
+
+# kind -> (model, {column: values() lookup})
+EXPORTS = {
+    "project": (ProjectTimeEntry, {
+        "id": "id",
+        "user_id": "user_id",
+        "username": "user__username",
+        "project_id": "project_id",
+        "project_name": "project__name",
+        "shift_id": "shift_id",
+        "start_time": "start_time",
+        "end_time": "end_time",
+        "description": "description",
+    }),
+    "task": (TaskTimeEntry, {
+        "id": "id",
+        "user_id": "user_id",
+        "username": "user__username",
+        "project_id": "task__project_id",
+        "project_name": "task__project__name",
+        "task_id": "task_id",
+        "task_text": "task__text",
+        "shift_id": "shift_id",
+        "start_time": "start_time",
+        "end_time": "end_time",
+    }),
+    "shift": (Shift, {
+        "id": "id",
+        "user_id": "user_id",
+        "username": "user__username",
+        "start_time": "start_time",
+        "end_time": "end_time",
+    }),
+}
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def export_queryset(kind, user):
+    model, columns = EXPORTS[kind]
+    rows = model.objects.all()
+    if not user.is_staff:
+        # own rows plus entries booked on projects the user owns
+        if kind == "project":
+            rows = rows.filter(Q(user=user) | Q(project__creator=user))
+        elif kind == "task":
+            rows = rows.filter(Q(user=user) | Q(task__project__creator=user))
+        else:
+            rows = rows.filter(user=user)
+    return rows
+
+
+class Echo:
+    """csv.writer target that hands each formatted line back instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_rows(queryset, kind, output, chunk_size=2000):
+    columns = EXPORTS[kind][1]
+    rows = queryset.order_by("id").values_list(*columns.values()).iterator(chunk_size=chunk_size)
+
+    if output == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(list(columns))
+        for row in rows:
+            yield writer.writerow(format_row(row))
+    else:
+        names = list(columns)
+        for row in rows:
+            yield json.dumps(dict(zip(names, format_row(row)))) + "\n"
+
+
+def format_row(row):
+    return [value.isoformat() if hasattr(value, "isoformat") else value for value in row]
@@ -0,0 +1,229 @@
+import hashlib
+import re
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import ImageBlob, UserImage
+
+STORAGE_ALIAS = "user_images"
+
+# longest edge in px; requests for larger sizes get the original
+VARIANT_SIZES = (32, 64, 256)
+
+# format -> (Pillow format, content type, save options)
+VARIANT_FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", "image/jpeg", {"quality": 85, "optimize": True}),
+}
+
+# Pillow format -> content type of the uploads served inline; anything else (HTML, SVG, ...)
+# could run script on the API origin and is only ever sent as a download
+IMAGE_CONTENT_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "WEBP": "image/webp",
+}
+
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Image links are signed and expire after IMAGE_URL_MAX_AGE seconds. Links issued within the
+# same IMAGE_URL_WINDOW share one expiry, so repeated reads hand out the same cacheable URL.
+IMAGE_URL_MAX_AGE = getattr(settings, "IMAGE_URL_MAX_AGE", 24 * 60 * 60)
+IMAGE_URL_WINDOW = getattr(settings, "IMAGE_URL_WINDOW", 60 * 60)
+URL_SIGNER = signing.Signer(salt="core.images.url")
+
+
+def image_storage():
+    return storages[STORAGE_ALIAS]
+
+
+def blob_path(digest):
+    # fan out so no directory ends up with every upload
+    return f"{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+def variant_path(digest, size, fmt):
+    return f"variants/{digest[:2]}/{digest}/{size}.{fmt}"
+
+
+def hash_file(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def store_blob(file):
+    """
+    Store an uploaded file under its sha256 and return (digest, size). Identical uploads share one blob.
+    Call it inside the transaction that creates the referencing UserImage: the locked ImageBlob row
+    keeps release_blob from deleting the file before that row is committed.
+    """
+    digest = hash_file(file)
+    ImageBlob.objects.select_for_update().get_or_create(sha256=digest, defaults={"size": file.size})
+    storage = image_storage()
+    path = blob_path(digest)
+    if not storage.exists(path):
+        saved = storage.save(path, file)
+        if saved != path:
+            # a concurrent upload of the same content won the race
+            storage.delete(saved)
+    return digest, file.size
+
+
+def store_bytes(data):
+    return store_blob(ContentFile(data))
+
+
+def open_blob(digest):
+    return open_path(blob_path(digest))
+
+
+def open_path(path):
+    return image_storage().open(path, "rb")
+
+
+def read_blob(digest):
+    with open_blob(digest) as blob:
+        return blob.read()
+
+
+def release_blob(digest):
+    """Delete a blob and its variants once no UserImage references it any more."""
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(sha256=digest).first()
+        # checked under the lock, so an upload reusing the blob has either committed or not started
+        if blob is None or UserImage.objects.filter(sha256=digest).exists():
+            return
+        blob.delete()
+        delete_blob(digest)
+
+
+def delete_blob(digest):
+    storage = image_storage()
+    paths = [blob_path(digest)]
+    paths += [variant_path(digest, size, fmt) for size in VARIANT_SIZES for fmt in VARIANT_FORMATS]
+    for path in paths:
+        if storage.exists(path):
+            storage.delete(path)
+
+
+def detect_content_type(file):
+    """Content type of an uploaded image as Pillow detects it, or None if it is not an image we serve."""
+    try:
+        with Image.open(file) as image:
+            fmt = image.format
+            image.verify()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        return None
+    finally:
+        file.seek(0)
+    return IMAGE_CONTENT_TYPES.get(fmt)
+
+
+def is_inline(content_type):
+    return content_type in IMAGE_CONTENT_TYPES.values()
+
+
+def build_variants(digest):
+    """
+    Render the downscaled variants of a stored blob and return (width, height, sizes).
+    Blobs Pillow cannot read (or oversized ones) get no variants and are served as uploaded.
+    """
+    storage = image_storage()
+    try:
+        with open_blob(digest) as blob:
+            original = Image.open(blob)
+            original = ImageOps.exif_transpose(original)
+            original.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        return None, None, []
+
+    width, height = original.size
+    sizes = [size for size in VARIANT_SIZES if size < max(width, height)]
+    for size in sizes:
+        thumbnail = original.copy()
+        thumbnail.thumbnail((size, size), Image.Resampling.LANCZOS)
+        for fmt, (pil_format, _, options) in VARIANT_FORMATS.items():
+            path = variant_path(digest, size, fmt)
+            if storage.exists(path):
+                continue
+            frame = thumbnail
+            if pil_format == "JPEG" and frame.mode != "RGB":
+                # JPEG has no alpha channel, flatten onto white
+                frame = Image.new("RGB", thumbnail.size, "white")
+                rgba = thumbnail.convert("RGBA")
+                frame.paste(rgba, mask=rgba.getchannel("A"))
+            elif frame.mode not in ("RGB", "RGBA"):
+                frame = frame.convert("RGBA")
+            buffer = BytesIO()
+            frame.save(buffer, pil_format, **options)
+            saved = storage.save(path, ContentFile(buffer.getvalue()))
+            if saved != path:
+                storage.delete(saved)
+    return width, height, sizes
+
+
+def pick_variant(sizes, wanted):
+    """Smallest stored variant that still covers `wanted` px, or None for the original."""
+    fitting = [size for size in sizes if size >= wanted]
+    return min(fitting) if fitting else None
+
+
+def variant_format(accept):
+    return "webp" if "image/webp" in (accept or "") else "jpg"
+
+
+def sign_url_token(digest, now=None):
+    now = time.time() if now is None else now
+    expires = (int(now) // IMAGE_URL_WINDOW + 1) * IMAGE_URL_WINDOW + IMAGE_URL_MAX_AGE
+    return URL_SIGNER.sign(f"{digest}.{expires}")
+
+
+def unsign_url_token(token, now=None):
+    """Return (digest, expires) for a valid, unexpired link token, else raise signing.BadSignature."""
+    digest, _, expires = URL_SIGNER.unsign(token).partition(".")
+    expires = int(expires)
+    if expires < (time.time() if now is None else now):
+        raise signing.SignatureExpired("Image link expired")
+    return digest, expires
+
+
+def parse_byte_range(header, size):
+    """
+    (start, end) of a single "bytes=" range, inclusive. Returns None when the
+    header should be ignored and raises ValueError when it cannot be satisfied.
+    """
+    match = BYTE_RANGE.match(header or "")
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # suffix range: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size:
+        raise ValueError("Unsatisfiable range")
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def read_range(path, start, end):
+    with open_path(path) as blob:
+        blob.seek(start)
+        return blob.read(end - start + 1)
@@ -0,0 +1,144 @@
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+REQUEST_INSTRUMENTATION = getattr(settings, "REQUEST_INSTRUMENTATION", True)
+REQUEST_QUERY_BUDGET = getattr(settings, "REQUEST_QUERY_BUDGET", 25)
+REQUEST_TIME_BUDGET_MS = getattr(settings, "REQUEST_TIME_BUDGET_MS", 500)
+# Server-Timing exposes query counts and internals; staff always get it, everyone else only when enabled
+REQUEST_SERVER_TIMING = getattr(settings, "REQUEST_SERVER_TIMING", False)
+
+_current = ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = ("queries", "sql", "serialize", "view", "view_start", "depth")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = self.serialize = self.view = 0.0
+        self.view_start = None
+        self.depth = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - start
+            self.queries += 1
+
+
+class TimedSerializerMixin:
+    """Adds the top-level to_representation time to the current request's serialize timing."""
+
+    def to_representation(self, instance):
+        stats = _current.get()
+        if stats is None or stats.depth:
+            return super().to_representation(instance)
+        stats.depth += 1
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            stats.serialize += time.perf_counter() - start
+            stats.depth -= 1
+
+
+def over_budget(queries, total_ms):
+    exceeded = []
+    if REQUEST_QUERY_BUDGET is not None and queries > REQUEST_QUERY_BUDGET:
+        exceeded.append("queries")
+    if REQUEST_TIME_BUDGET_MS is not None and total_ms > REQUEST_TIME_BUDGET_MS:
+        exceeded.append("time")
+    return exceeded
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Per-request query count, SQL, serializer and view time, logged as one JSON line;
+    requests over budget are logged as warnings. Staff users (or everyone, with
+    REQUEST_SERVER_TIMING) also get the numbers back as a Server-Timing header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not REQUEST_INSTRUMENTATION:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(stats.record_query):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        end = time.perf_counter()
+        if stats.view_start is not None:
+            stats.view = end - stats.view_start
+
+        total_ms = (end - start) * 1000
+        if REQUEST_SERVER_TIMING or getattr(getattr(request, "user", None), "is_staff", False):
+            # for streaming responses this covers everything up to the first byte
+            response["Server-Timing"] = ", ".join([
+                f'db;dur={stats.sql * 1000:.1f};desc="{stats.queries} queries"',
+                f"serialize;dur={stats.serialize * 1000:.1f}",
+                f"view;dur={stats.view * 1000:.1f}",
+                f"total;dur={total_ms:.1f}",
+            ])
+        # a generated body (and the queries behind it) is produced after we return, so it is
+        # logged once consumed; files keep their wsgi.file_wrapper path and run no queries
+        if response.streaming and not response.is_async and getattr(response, "file_to_stream", None) is None:
+            response.streaming_content = self.stream(response.streaming_content, request, response, stats, total_ms, end)
+        else:
+            self.log(request, response, stats, total_ms)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = _current.get()
+        if stats is not None:
+            stats.view_start = time.perf_counter()
+
+    def stream(self, content, request, response, stats, total_ms, start):
+        try:
+            with connection.execute_wrapper(stats.record_query):
+                yield from content
+        finally:
+            self.log(request, response, stats, total_ms, stream_ms=(time.perf_counter() - start) * 1000)
+
+    def log(self, request, response, stats, total_ms, stream_ms=None):
+        # the time budget covers the view; a slow client must not flag a streamed download
+        exceeded = over_budget(stats.queries, total_ms)
+        match = request.resolver_match
+        line = {
+            "method": request.method,
+            "path": request.path,
+            "route": match.route if match else None,
+            "status": response.status_code,
+            "queries": stats.queries,
+            "sql_ms": round(stats.sql * 1000, 1),
+            "serialize_ms": round(stats.serialize * 1000, 1),
+            "view_ms": round(stats.view * 1000, 1),
+            "total_ms": round(total_ms, 1),
+        }
+        if stream_ms is not None:
+            line["streaming"] = True
+            line["stream_ms"] = round(stream_ms, 1)
+        if exceeded:
+            line["over_budget"] = exceeded
+            for kind in exceeded:
+                metrics.incr(f"budget.{kind}")
+            logger.warning(json.dumps(line))
+        else:
+            logger.info(json.dumps(line))
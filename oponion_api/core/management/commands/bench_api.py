@@ -0,0 +1,273 @@
+import json
+import logging
+import math
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+import django
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core import images, urls
+from core.models import Invitation, Meeting, Project, ProjectTimeEntry, Shift, Task, TaskTimeEntry, UserImage
+
+from .seed_data import SEED_PASSWORD
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every route in core/urls.py against the current database (see seed_data) and report "
+        "p50/p95 latency, queries and peak memory per request as JSON. Each request runs in a "
+        "rolled-back transaction, so writes leave the data unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username to run as (default: the seeded user with the most projects).")
+        parser.add_argument("--prefix", default="seed", help="Username prefix used by seed_data.")
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--route", action="append", dest="routes", help="Only run requests whose label contains this (repeatable).")
+        parser.add_argument("--cold", action="store_true", help="Clear the cache before every request.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--compare", help="Print the change against an earlier --output file.")
+
+    def handle(self, *args, **options):
+        user = self.bench_user(options)
+        # the test client's host, no mail leaving the machine and no DEBUG query log
+        environment = override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+            DEBUG=False,
+        )
+        environment.enable()
+        # over-budget warnings from the instrumentation middleware would drown the report
+        instrumentation_logger = logging.getLogger("core.instrumentation")
+        level = instrumentation_logger.level
+        instrumentation_logger.setLevel(logging.ERROR)
+        try:
+            # a failing route is reported with its status instead of aborting the run
+            client = Client(raise_request_exception=False)
+            requests = self.requests(user)
+            covered = {self.route_of(path) for _, _, path, _ in requests}
+            if options["routes"]:
+                requests = [request for request in requests if any(part in request[0] for part in options["routes"])]
+
+            results = {}
+            for label, method, path, body in requests:
+                # a fresh token per route; a long run would outlive one access token
+                client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {RefreshToken.for_user(user).access_token}"
+                results[label] = self.measure(client, method, path, body, options)
+                row = results[label]
+                self.stdout.write(
+                    f"{label:<55} {row['status']:>3}  p50 {row['p50_ms']:8.2f} ms  p95 {row['p95_ms']:8.2f} ms  "
+                    f"{row['queries']:5.1f} q  {row['peak_kb']:9.1f} KiB"
+                )
+        finally:
+            instrumentation_logger.setLevel(level)
+            environment.disable()
+
+        report = {
+            "meta": {
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "iterations": options["iterations"],
+                "cold_cache": options["cold"],
+                "rows": {
+                    model.__name__: model.objects.count()
+                    for model in (User, Project, Task, Shift, ProjectTimeEntry, TaskTimeEntry, Invitation, Meeting)
+                },
+            },
+            "results": results,
+            "uncovered_routes": sorted(str(pattern.pattern) for pattern in urls.urlpatterns if str(pattern.pattern) not in covered),
+        }
+        if report["uncovered_routes"]:
+            self.stdout.write(self.style.WARNING(f"Not exercised: {', '.join(report['uncovered_routes'])}"))
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(report, output, indent=2, sort_keys=True)
+                output.write("\n")
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        if options["compare"]:
+            self.compare(options["compare"], results)
+
+    def bench_user(self, options):
+        if options["user"]:
+            user = User.objects.filter(username=options["user"]).first()
+        else:
+            user = (
+                User.objects.filter(username__startswith=f"{options['prefix']}-")
+                .annotate(projects=Count("invited_projects"))
+                .order_by("-projects", "id")
+                .first()
+            )
+        if user is None:
+            raise CommandError("No user to run as; seed the database first (manage.py seed_data) or pass --user.")
+        return user
+
+    def route_of(self, path):
+        path = path.split("?", 1)[0].removeprefix("/api/")
+        for pattern in urls.urlpatterns:
+            if pattern.pattern.match(path):
+                return str(pattern.pattern)
+        return None
+
+    def requests(self, user):
+        """(label, method, path, json body) for every route, built from rows the user can see."""
+        project = Project.objects.visible_to(user).order_by("id").first()
+        task = Task.objects.filter(project=project).order_by("id").first() if project else None
+        meeting = Meeting.objects.filter(creator=user).order_by("id").first()
+        shift = Shift.objects.filter(user=user).order_by("-start_time").first()
+        entry = ProjectTimeEntry.objects.filter(user=user).order_by("-start_time").first()
+        task_entry = TaskTimeEntry.objects.filter(user=user).order_by("-start_time").first()
+        invitation = Invitation.objects.filter(status="pending").order_by("id").first()
+        image = UserImage.objects.order_by("id").first()
+        others = list(User.objects.exclude(id=user.id).order_by("id").values_list("id", flat=True)[:50])
+        refresh = str(RefreshToken.for_user(user))
+
+        now = timezone.now()
+        today = timezone.localdate()
+        month_ago = (today - timedelta(days=30)).isoformat()
+
+        requests = [
+            ("GET schema/", "GET", "/api/schema/", None),
+            ("GET docs/", "GET", "/api/docs/", None),
+            ("POST register/", "POST", "/api/register/", {"username": "bench-register", "email": "bench-register@example.com", "password": "bench-password"}),
+            ("POST login/", "POST", "/api/login/", {"username": user.username, "password": SEED_PASSWORD}),
+            ("POST refresh/", "POST", "/api/refresh/", {"refresh": refresh}),
+            ("GET projects/", "GET", "/api/projects/", None),
+            ("POST projects/", "POST", "/api/projects/", {"name": "Bench project", "creator": user.id}),
+            ("GET task/", "GET", "/api/task/", None),
+            ("GET user-search/?q=user-1", "GET", "/api/user-search/?q=user-1", None),
+            ("GET info/", "GET", "/api/info/", None),
+            ("GET infoForDisplay/", "GET", f"/api/infoForDisplay/?userID={user.id}", None),
+            ("GET infoForDisplay/batch/", "GET", "/api/infoForDisplay/batch/?ids=" + ",".join(map(str, others)), None),
+            ("GET meeting/", "GET", "/api/meeting/", None),
+            ("POST password/reset", "POST", "/api/password/reset", {"old_password": SEED_PASSWORD, "new_password": "bench-password-2"}),
+            ("GET userImage/", "GET", "/api/userImage/?type=profile", None),
+            ("GET shifts/", "GET", "/api/shifts/", None),
+            ("GET shifts/?from=&to=", "GET", f"/api/shifts/?from={month_ago}&to={today.isoformat()}", None),
+            ("POST shifts/", "POST", "/api/shifts/", {"start_time": now.isoformat(), "end_time": (now + timedelta(hours=1)).isoformat()}),
+            ("GET project-time/", "GET", "/api/project-time/", None),
+            ("GET task-time/", "GET", "/api/task-time/", None),
+            ("GET sync/", "GET", "/api/sync/", None),
+            ("GET metrics/", "GET", "/api/metrics/", None),
+            ("GET reports/time/", "GET", f"/api/reports/time/?from={month_ago}", None),
+            ("GET reports/time/?group_by=task", "GET", f"/api/reports/time/?from={month_ago}&group_by=project,task", None),
+            ("GET export/time-entries/", "GET", f"/api/export/time-entries/?from={month_ago}", None),
+            ("POST time/batch/", "POST", "/api/time/batch/", {
+                "shifts": [{"ref": "s", "start_time": now.isoformat(), "end_time": (now + timedelta(hours=2)).isoformat()}],
+                "project_entries": [
+                    {"shift_ref": "s", "project": project.id, "start_time": now.isoformat(), "end_time": (now + timedelta(hours=1)).isoformat()}
+                ] if project else [],
+            }),
+        ]
+        if project:
+            requests += [
+                ("GET projects/?project_id", "GET", f"/api/projects/?project_id={project.id}", None),
+                ("GET task/?project_id", "GET", f"/api/task/?project_id={project.id}", None),
+                ("GET invitation/", "GET", f"/api/invitation/?project_id={project.id}", None),
+                ("GET users/selectable/", "GET", f"/api/users/selectable/?project_id={project.id}", None),
+                ("GET projects/<id>/invited-users/", "GET", f"/api/projects/{project.id}/invited-users/", None),
+                ("POST invitations/send/", "POST", "/api/invitations/send/", {"to_user_id": others[0], "project_id": project.id}),
+                ("POST invitations/bulk/", "POST", "/api/invitations/bulk/", {"project_id": project.id, "user_ids": others}),
+                ("POST task/", "POST", "/api/task/", {"project": project.id, "assigned_to": user.id, "text": "Bench task"}),
+            ]
+        if task:
+            requests.append(("GET task/?task_id", "GET", f"/api/task/?task_id={task.id}", None))
+        if meeting:
+            requests.append(("GET meeting/?meeting_id", "GET", f"/api/meeting/?meeting_id={meeting.id}", None))
+        if shift:
+            requests.append(("GET shifts/?shift_id", "GET", f"/api/shifts/?shift_id={shift.id}", None))
+        if entry:
+            requests.append(("GET project-time/?entry_id", "GET", f"/api/project-time/?entry_id={entry.id}", None))
+        if task_entry:
+            requests.append(("GET task-time/?entry_id", "GET", f"/api/task-time/?entry_id={task_entry.id}", None))
+        if invitation:
+            requests.append(("GET invitations/confirm/<token>/", "GET", f"/api/invitations/confirm/{invitation.token}/", None))
+        if image:
+            # a signed link like the views hand out; the bare digest is rejected with 403
+            requests.append(("GET images/<token>/", "GET", f"/api/images/{images.sign_url_token(image.sha256)}/", None))
+        return requests
+
+    def send(self, client, method, path, body, options, counter):
+        if options["cold"]:
+            cache.clear()
+        with transaction.atomic():
+            with connection.execute_wrapper(counter):
+                start = time.perf_counter()
+                if body is None:
+                    response = client.generic(method, path)
+                else:
+                    response = client.generic(method, path, json.dumps(body), content_type="application/json")
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+                elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return response.status_code, elapsed
+
+    def measure(self, client, method, path, body, options):
+        queries = [0]
+
+        def counter(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        def ignore(execute, sql, params, many, context):
+            return execute(sql, params, many, context)
+
+        for _ in range(options["warmup"]):
+            self.send(client, method, path, body, options, ignore)
+
+        timings = []
+        for _ in range(options["iterations"]):
+            status, elapsed = self.send(client, method, path, body, options, counter)
+            timings.append(elapsed * 1000)
+
+        # tracemalloc slows everything down, so memory gets its own run
+        tracemalloc.start()
+        try:
+            self.send(client, method, path, body, options, ignore)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "status": status,
+            "p50_ms": round(percentile(timings, 0.5), 2),
+            "p95_ms": round(percentile(timings, 0.95), 2),
+            "mean_ms": round(statistics.fmean(timings), 2),
+            "queries": round(queries[0] / options["iterations"], 1),
+            "peak_kb": round(peak / 1024, 1),
+        }
+
+    def compare(self, path, results):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        self.stdout.write(f"\nChange against {path}:")
+        for label, row in results.items():
+            before = baseline.get(label)
+            if before is None:
+                self.stdout.write(f"{label:<55} new")
+                continue
+            p50 = (row["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0.0
+            p95 = (row["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+            self.stdout.write(
+                f"{label:<55} p50 {p50:+7.1f}%  p95 {p95:+7.1f}%  queries {row['queries'] - before['queries']:+6.1f}"
+            )
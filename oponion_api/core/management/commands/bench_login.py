@@ -0,0 +1,50 @@
+import time
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.serializer import MyTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = "Time the login serializer against the previous double-hash path. Runs in a rolled-back transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        with transaction.atomic():
+            user = User.objects.create_user(username="bench-login", email="bench-login@example.com", password="bench-password")
+            credentials = {"username": user.email, "password": "bench-password"}
+
+            results = {
+                "legacy": self.measure(iterations, lambda: self.legacy_login(credentials)),
+                "current": self.measure(iterations, lambda: MyTokenObtainPairSerializer(data=credentials).is_valid(raise_exception=True)),
+            }
+            transaction.set_rollback(True)
+
+        for name, (ms, queries) in results.items():
+            self.stdout.write(f"{name:<8} {ms:8.1f} ms/login  {queries:4.1f} queries/login")
+        legacy, current = results["legacy"][0], results["current"][0]
+        self.stdout.write(self.style.SUCCESS(f"speedup x{legacy / current:.2f}"))
+
+    def measure(self, iterations, login):
+        login()  # warm up
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                login()
+            elapsed = time.perf_counter() - start
+        return elapsed * 1000 / iterations, len(queries) / iterations
+
+    def legacy_login(self, credentials):
+        # the former MyTokenObtainPairSerializer.validate: two lookups, check_password, then authenticate()
+        user = User.objects.filter(email=credentials["username"]).first()
+        if user is None:
+            user = User.objects.filter(username=credentials["username"]).first()
+        user.check_password(credentials["password"])
+        authenticate(username=user.username, password=credentials["password"])
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.images import build_variants
+from core.models import UserImage
+
+
+class Command(BaseCommand):
+    help = "Render the downscaled variants for user images uploaded before variants existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Also re-render images that already have variants.")
+
+    def handle(self, *args, **options):
+        pending = UserImage.objects.all()
+        if not options["all"]:
+            pending = pending.filter(width__isnull=True)
+
+        count = 0
+        # one render per distinct blob, shared by every row pointing at it
+        for digest in pending.values_list("sha256", flat=True).distinct().iterator():
+            width, height, sizes = build_variants(digest)
+            UserImage.objects.filter(sha256=digest).update(width=width, height=height, variant_sizes=sizes)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rendered variants for {count} image(s)."))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+
+from core.buckets import bucket_totals
+from core.models import DailyTimeBucket, ProjectTimeEntry, TaskTimeEntry
+from core.rollups import Span
+
+
+class Command(BaseCommand):
+    help = "Regenerate DailyTimeBucket rows from ProjectTimeEntry and TaskTimeEntry, one user at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Only rebuild this user id (repeatable).")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Entries fetched per database round trip.")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        user_ids = options["users"] or sorted(
+            set(ProjectTimeEntry.objects.values_list("user_id", flat=True).distinct())
+            | set(TaskTimeEntry.objects.values_list("user_id", flat=True).distinct())
+            | set(DailyTimeBucket.objects.values_list("user_id", flat=True).distinct())
+        )
+
+        total = 0
+        for user_id in user_ids:
+            total += self.rebuild(user_id, chunk_size)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} bucket(s) for {len(user_ids)} user(s)."))
+
+    def rebuild(self, user_id, chunk_size):
+        for attempt in range(3):
+            try:
+                with transaction.atomic():
+                    # Locking the user's buckets makes concurrent increments wait and land on the
+                    # rebuilt rows; locking the entries keeps them from changing while they are read.
+                    list(DailyTimeBucket.objects.select_for_update().filter(user_id=user_id).values_list("id", flat=True))
+                    totals = bucket_totals(self.spans(user_id, chunk_size))
+                    buckets = [
+                        DailyTimeBucket(**key._asdict(), duration=duration, entries=entries)
+                        for key, (duration, entries) in totals.items()
+                    ]
+                    DailyTimeBucket.objects.filter(user_id=user_id).delete()
+                    DailyTimeBucket.objects.bulk_create(buckets, batch_size=chunk_size)
+                return len(buckets)
+            except IntegrityError:
+                # a writer created a bucket for a new day while we were reading; start over
+                if attempt == 2:
+                    raise
+
+    def spans(self, user_id, chunk_size):
+        entries = ProjectTimeEntry.objects.select_for_update().filter(user_id=user_id).values_list("project_id", "start_time", "end_time")
+        for project_id, start_time, end_time in entries.iterator(chunk_size=chunk_size):
+            yield Span(user_id, project_id, None, start_time, end_time)
+
+        entries = TaskTimeEntry.objects.select_for_update(of=("self",)).filter(user_id=user_id).values_list(
+            "task__project_id", "task_id", "start_time", "end_time"
+        )
+        for project_id, task_id, start_time, end_time in entries.iterator(chunk_size=chunk_size):
+            yield Span(user_id, project_id, task_id, start_time, end_time)
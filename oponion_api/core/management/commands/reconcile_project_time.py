@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core import response_cache
+from core.models import Project
+from core.rollups import compute_project_time, get_timezone
+
+
+class Command(BaseCommand):
+    help = "Recompute Project.total_time and today_time from the raw time entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--project", type=int, action="append", dest="projects", help="Only reconcile this project id (repeatable).")
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without writing.")
+
+    def handle(self, *args, **options):
+        projects = Project.objects.with_timezone().order_by("id")
+        if options["projects"]:
+            projects = projects.filter(id__in=options["projects"])
+
+        checked = fixed = 0
+        for project_id, tz_name in projects.values_list("id", "creator_timezone").iterator():
+            tz = get_timezone(tz_name)
+            today = timezone.localdate(timezone=tz)
+            checked += 1
+
+            with transaction.atomic():
+                # the row lock keeps concurrent increments from slipping in between read and write
+                project = Project.objects.select_for_update().filter(id=project_id).first()
+                if project is None:
+                    continue
+                total, today_total = compute_project_time(project_id, tz, today)
+                if (project.total_time, project.today_time, project.today_date) == (total, today_total, today):
+                    continue
+
+                fixed += 1
+                self.stdout.write(
+                    f"Project {project_id}: total {project.total_time} -> {total}, today {project.today_time} -> {today_total}"
+                )
+                if not options["dry_run"]:
+                    Project.objects.filter(id=project_id).update(
+                        total_time=total, today_time=today_total, today_date=today, updated_at=timezone.now()
+                    )
+                    response_cache.bump_projects([project_id])
+
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} project(s), {fixed} out of sync."))
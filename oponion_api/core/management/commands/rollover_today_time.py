@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import Project
+from core.rollups import get_timezone
+
+
+class Command(BaseCommand):
+    help = "Reset Project.today_time for every project whose creator's local day has changed. Run hourly."
+
+    def handle(self, *args, **options):
+        names = (
+            Project.objects.values_list("creator__info__user_timezone", flat=True)
+            .order_by()
+            .distinct()
+        )
+        reset = 0
+        for name in names:
+            today = timezone.localdate(timezone=get_timezone(name))
+            projects = Project.objects.filter(creator__info__user_timezone=name)
+            if not name:
+                projects = Project.objects.filter(
+                    Q(creator__info__user_timezone="") | Q(creator__info__isnull=True)
+                )
+            reset += projects.filter(Q(today_date__lt=today) | Q(today_date__isnull=True)).update(
+                today_time=timedelta(0), today_date=today, updated_at=timezone.now()
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Rolled over today_time of {reset} project(s)."))
@@ -0,0 +1,224 @@
+import random
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from core import images
+from core.models import Invitation, Meeting, Project, ProjectTimeEntry, Shift, Task, TaskTimeEntry, UserImage, UserInformation
+
+TIMEZONES = ["Europe/Berlin", "Europe/London", "America/New_York", "Asia/Tokyo", ""]
+PRIORITIES = ["high", "medium", "low"]
+TASK_STATUSES = ["new", "in_progress", "done"]
+SEED_PASSWORD = "seed-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a large synthetic dataset (users, projects with members, tasks, "
+        "shifts and time entries) for load tests and benchmarks. Everything goes through bulk_create, "
+        "so signals do not fire; buckets and project totals are rebuilt at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=2000)
+        parser.add_argument("--projects", type=int, default=500)
+        parser.add_argument("--members", type=int, default=8, help="Invited members per project.")
+        parser.add_argument("--tasks", type=int, default=20, help="Tasks per project.")
+        parser.add_argument("--shifts", type=int, default=250, help="Shifts per user, one per day going back.")
+        parser.add_argument("--entries", type=int, default=2, help="Project time entries per shift.")
+        parser.add_argument("--task-ratio", type=float, default=0.5, help="Share of project entries that also get a task entry.")
+        parser.add_argument("--images", type=int, default=50, help="Users that get a profile image (with variants).")
+        parser.add_argument("--prefix", default="seed", help="Username prefix of the generated users.")
+        parser.add_argument("--seed", type=int, default=1, help="Random seed; the same seed produces the same dataset.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        prefix = options["prefix"]
+
+        # deleting an earlier run row by row through the signals would take longer than seeding anew
+        if User.objects.filter(username__startswith=f"{prefix}-").exists():
+            raise CommandError(f"Users with prefix '{prefix}-' already exist; use another --prefix or a fresh database.")
+
+        with transaction.atomic():
+            user_ids = self.create_users(prefix, options["users"])
+            projects = self.create_projects(user_ids, options["projects"], options["members"])
+            tasks = self.create_tasks(projects, options["tasks"])
+            self.create_invitations(user_ids, projects)
+            self.create_meetings(user_ids)
+        self.create_images(user_ids[: options["images"]])
+        shifts, entries, task_entries = self.create_time(
+            user_ids, projects, tasks, options["shifts"], options["entries"], options["task_ratio"]
+        )
+
+        self.stdout.write("Rebuilding time buckets and project totals...")
+        call_command("rebuild_time_buckets", users=user_ids, stdout=StringIO())
+        call_command("reconcile_project_time", projects=list(projects), stdout=StringIO())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(user_ids)} users, {len(projects)} projects, {sum(map(len, tasks.values()))} tasks, "
+            f"{shifts} shifts, {entries} project entries and {task_entries} task entries "
+            f"(password '{SEED_PASSWORD}')."
+        ))
+
+    def create_users(self, prefix, count):
+        # one hash shared by everyone; hashing per user would dominate the run
+        password = make_password(SEED_PASSWORD)
+        users = User.objects.bulk_create(
+            [User(username=f"{prefix}-user-{i}", email=f"{prefix}-user-{i}@example.com", password=password) for i in range(count)],
+            batch_size=self.batch_size,
+        )
+        UserInformation.objects.bulk_create(
+            [
+                UserInformation(
+                    user=user, username=user.username, first_name="Seed", last_name=str(i), email=user.email,
+                    user_timezone=self.rng.choice(TIMEZONES),
+                )
+                for i, user in enumerate(users)
+            ],
+            batch_size=self.batch_size,
+        )
+        return [user.id for user in users]
+
+    def create_projects(self, user_ids, count, members):
+        """Returns {project_id: [creator and member ids]}."""
+        projects = Project.objects.bulk_create(
+            [
+                Project(
+                    creator_id=self.rng.choice(user_ids), name=f"Project {i}", priority=self.rng.choice(PRIORITIES),
+                    description="Generated by seed_data",
+                )
+                for i in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        through = Project.invited_users.through
+        links = []
+        teams = {}
+        for project in projects:
+            invited = [user_id for user_id in self.rng.sample(user_ids, min(members, len(user_ids))) if user_id != project.creator_id]
+            links.extend(through(project_id=project.id, user_id=user_id) for user_id in invited)
+            teams[project.id] = [project.creator_id, *invited]
+        through.objects.bulk_create(links, batch_size=self.batch_size)
+        return teams
+
+    def create_tasks(self, projects, per_project):
+        """Returns {project_id: [task ids]}."""
+        tasks = Task.objects.bulk_create(
+            [
+                Task(
+                    project_id=project_id, assigned_to_id=self.rng.choice(team), text=f"Task {i}",
+                    status=self.rng.choice(TASK_STATUSES), priority=self.rng.choice(PRIORITIES),
+                )
+                for project_id, team in projects.items()
+                for i in range(per_project)
+            ],
+            batch_size=self.batch_size,
+        )
+        by_project = {project_id: [] for project_id in projects}
+        for task in tasks:
+            by_project[task.project_id].append(task.id)
+        return by_project
+
+    def create_invitations(self, user_ids, projects):
+        invitations = []
+        for project_id, team in projects.items():
+            outsider = self.rng.choice(user_ids)
+            if outsider not in team:
+                invitations.append(Invitation(from_user_id=team[0], to_user_id=outsider, project_id=project_id))
+        Invitation.objects.bulk_create(invitations, batch_size=self.batch_size)
+
+    def create_meetings(self, user_ids):
+        now = timezone.now()
+        meetings = []
+        for user_id in user_ids:
+            start = now + timedelta(days=self.rng.randint(-30, 30), hours=self.rng.randint(-4, 4))
+            meetings.append(Meeting(creator_id=user_id, text="Weekly sync", from_date=start, to_date=start + timedelta(hours=1)))
+        meetings = Meeting.objects.bulk_create(meetings, batch_size=self.batch_size)
+        through = Meeting.invited_users.through
+        through.objects.bulk_create(
+            [
+                through(meeting_id=meeting.id, user_id=user_id)
+                for meeting in meetings
+                for user_id in self.rng.sample(user_ids, min(3, len(user_ids)))
+                if user_id != meeting.creator_id
+            ],
+            batch_size=self.batch_size,
+        )
+
+    @transaction.atomic
+    def create_images(self, user_ids):
+        rows = []
+        for user_id in user_ids:
+            buffer = BytesIO()
+            Image.new("RGB", (512, 512), tuple(self.rng.randrange(256) for _ in range(3))).save(buffer, "PNG")
+            digest, size = images.store_bytes(buffer.getvalue())
+            width, height, variant_sizes = images.build_variants(digest)
+            rows.append(UserImage(
+                user_id=user_id, sha256=digest, size=size, width=width, height=height,
+                variant_sizes=variant_sizes, content_type="image/png", type="profile",
+            ))
+        UserImage.objects.bulk_create(rows, batch_size=self.batch_size)
+
+    def create_time(self, user_ids, projects, tasks, per_user, per_shift, task_ratio):
+        memberships = {user_id: [] for user_id in user_ids}
+        for project_id, team in projects.items():
+            for user_id in team:
+                memberships[user_id].append(project_id)
+
+        today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        counts = [0, 0, 0]
+        pending = []
+        for user_id in user_ids:
+            for day in range(1, per_user + 1):
+                start = today - timedelta(days=day) + timedelta(hours=self.rng.randint(6, 10), minutes=self.rng.randint(0, 59))
+                end = start + timedelta(hours=self.rng.randint(4, 9))
+                pending.append((user_id, start, end))
+            if len(pending) >= self.batch_size:
+                self.flush_shifts(pending, memberships, tasks, per_shift, task_ratio, counts)
+                pending = []
+        if pending:
+            self.flush_shifts(pending, memberships, tasks, per_shift, task_ratio, counts)
+        return counts
+
+    def flush_shifts(self, pending, memberships, tasks, per_shift, task_ratio, counts):
+        with transaction.atomic():
+            shifts = Shift.objects.bulk_create(
+                [Shift(user_id=user_id, start_time=start, end_time=end) for user_id, start, end in pending],
+                batch_size=self.batch_size,
+            )
+            entries = []
+            task_entries = []
+            for shift in shifts:
+                user_projects = memberships[shift.user_id]
+                if not user_projects:
+                    continue
+                # consecutive slices of the shift, each booked on one of the user's projects
+                step = (shift.end_time - shift.start_time) / per_shift
+                for i in range(per_shift):
+                    start = shift.start_time + step * i
+                    end = start + step
+                    project_id = self.rng.choice(user_projects)
+                    entries.append(ProjectTimeEntry(
+                        user_id=shift.user_id, project_id=project_id, shift_id=shift.id, start_time=start, end_time=end,
+                    ))
+                    if tasks[project_id] and self.rng.random() < task_ratio:
+                        task_entries.append(TaskTimeEntry(
+                            user_id=shift.user_id, task_id=self.rng.choice(tasks[project_id]), shift_id=shift.id,
+                            start_time=start, end_time=end,
+                        ))
+            ProjectTimeEntry.objects.bulk_create(entries, batch_size=self.batch_size)
+            TaskTimeEntry.objects.bulk_create(task_entries, batch_size=self.batch_size)
+
+        counts[0] += len(shifts)
+        counts[1] += len(entries)
+        counts[2] += len(task_entries)
+        self.stdout.write(f"  {counts[0]} shifts, {counts[1]} project entries, {counts[2]} task entries")
@@ -0,0 +1,35 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.outbox import OUTBOX_BATCH_SIZE, drain
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Send queued outbox emails in batches over one SMTP connection, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE, help="Emails claimed per batch.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting once the outbox is empty.")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent, failed = drain(batch_size=options["batch_size"])
+            except Exception:
+                if not options["loop"]:
+                    raise
+                # a lost database or mail server must not end the worker; leased rows come due again
+                logger.exception("Outbox drain failed, retrying in %s s", options["interval"])
+                close_old_connections()
+            else:
+                if sent or failed or not options["loop"]:
+                    self.stdout.write(self.style.SUCCESS(f"Sent {sent} email(s), {failed} failed or deferred."))
+                if not options["loop"]:
+                    return
+            time.sleep(options["interval"])
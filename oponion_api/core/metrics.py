@@ -0,0 +1,29 @@
+import threading
+from collections import Counter
+
+# Per-process counters; every gunicorn worker reports its own numbers.
+_counters = Counter()
+_lock = threading.Lock()
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def snapshot():
+    with _lock:
+        counters = dict(_counters)
+
+    hit_rates = {}
+    for name, hits in counters.items():
+        if name.endswith(".hit"):
+            prefix = name[: -len(".hit")]
+            total = hits + counters.get(f"{prefix}.miss", 0)
+            hit_rates[prefix] = round(hits / total, 4) if total else 0.0
+    return {"counters": counters, "hit_rates": hit_rates}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
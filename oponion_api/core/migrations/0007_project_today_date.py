@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_alter_shift_end_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='today_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_project_today_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='meeting',
+            index=models.Index(fields=['creator', 'from_date', 'id'], name='meeting_creator_from_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projecttimeentry',
+            index=models.Index(fields=['user', 'start_time', 'id'], name='pte_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['user', 'start_time', 'id'], name='shift_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['assigned_to', 'id'], name='task_assignee_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasktimeentry',
+            index=models.Index(fields=['user', 'start_time', 'id'], name='tte_user_start_idx'),
+        ),
+    ]
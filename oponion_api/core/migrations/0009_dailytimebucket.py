@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:02
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTimeBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('duration', models.DurationField(default=datetime.timedelta)),
+                ('entries', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_buckets', to='core.project')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='time_buckets', to='core.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_buckets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date'], name='bucket_user_date_idx'), models.Index(fields=['project', 'date'], name='bucket_project_date_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('task__isnull', True)), fields=('user', 'project', 'date'), name='bucket_unique_project_day'), models.UniqueConstraint(condition=models.Q(('task__isnull', False)), fields=('user', 'project', 'task', 'date'), name='bucket_unique_task_day')],
+            },
+        ),
+    ]
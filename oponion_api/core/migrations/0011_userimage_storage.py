@@ -0,0 +1,96 @@
+import hashlib
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import migrations, models, transaction
+
+CHUNK_SIZE = 100
+
+
+# Frozen copies of the core.images helpers of this migration's time, so later changes
+# to that module cannot change what the migration does.
+def blob_path(digest):
+    return f"{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+def store_bytes(data):
+    digest = hashlib.sha256(data).hexdigest()
+    storage = storages['user_images']
+    path = blob_path(digest)
+    if not storage.exists(path):
+        storage.save(path, ContentFile(data))
+    return digest, len(data)
+
+
+def read_blob(digest):
+    with storages['user_images'].open(blob_path(digest), 'rb') as blob:
+        return blob.read()
+
+
+def move_blobs_to_storage(apps, schema_editor):
+    UserImage = apps.get_model('core', 'UserImage')
+    last_id = 0
+    while True:
+        # keyset over id so every chunk holds at most CHUNK_SIZE blobs in memory
+        with transaction.atomic():
+            chunk = list(
+                UserImage.objects.filter(id__gt=last_id, sha256='')
+                .order_by('id').only('id', 'image_data')[:CHUNK_SIZE]
+            )
+            if not chunk:
+                return
+            for image in chunk:
+                image.sha256, image.size = store_bytes(bytes(image.image_data or b''))
+            UserImage.objects.bulk_update(chunk, ['sha256', 'size'])
+        last_id = chunk[-1].id
+
+
+def restore_blobs_from_storage(apps, schema_editor):
+    UserImage = apps.get_model('core', 'UserImage')
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            chunk = list(UserImage.objects.filter(id__gt=last_id).order_by('id').only('id', 'sha256')[:CHUNK_SIZE])
+            if not chunk:
+                return
+            for image in chunk:
+                image.image_data = read_blob(image.sha256)
+            UserImage.objects.bulk_update(chunk, ['image_data'])
+        last_id = chunk[-1].id
+
+
+class Migration(migrations.Migration):
+    # each chunk commits on its own so a large table is not copied in one transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0010_sync_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userimage',
+            name='sha256',
+            field=models.CharField(db_index=True, default='', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='userimage',
+            name='size',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='userimage',
+            name='image_data',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.RunPython(move_blobs_to_storage, restore_blobs_from_storage),
+        migrations.RemoveField(
+            model_name='userimage',
+            name='image_data',
+        ),
+        migrations.AddIndex(
+            model_name='userimage',
+            index=models.Index(fields=['user', 'type', 'id'], name='userimage_user_type_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# UserSearchView filters on UPPER(col::text) LIKE ... (icontains / istartswith),
+# so the indexes are built on exactly that expression.
+INDEXES = [
+    ("core_user_username_trgm", "gin (UPPER(username::text) gin_trgm_ops)"),
+    ("core_user_email_trgm", "gin (UPPER(email::text) gin_trgm_ops)"),
+    # prefix lookups for queries too short for trigrams
+    ("core_user_username_prefix", "btree (UPPER(username::text) text_pattern_ops)"),
+    ("core_user_email_prefix", "btree (UPPER(email::text) text_pattern_ops)"),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    # pg_trgm only exists on PostgreSQL; SQLite falls back to a plain LIKE scan
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, definition in INDEXES:
+        # an interrupted concurrent build leaves an INVALID index that IF NOT EXISTS would keep
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)', [name]
+            )
+            row = cursor.fetchone()
+        if row and row[0]:
+            schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+        schema_editor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON auth_user USING {definition}')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction; it builds the indexes
+    # without blocking writes to auth_user (sign-ups, logins updating last_login)
+    atomic = False
+
+    dependencies = [
+        ('core', '0012_userimage_variants'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:03
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def create_blob_rows(apps, schema_editor):
+    UserImage = apps.get_model('core', 'UserImage')
+    ImageBlob = apps.get_model('core', 'ImageBlob')
+    blobs = UserImage.objects.exclude(sha256='').values('sha256').annotate(size=Max('size')).order_by('sha256')
+    ImageBlob.objects.bulk_create(
+        (ImageBlob(sha256=blob['sha256'], size=blob['size']) for blob in blobs.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(create_blob_rows, migrations.RunPython.noop),
+    ]
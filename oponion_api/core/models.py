@@ -1,10 +1,25 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from datetime import timedelta
 from django.utils import timezone
 import uuid
 
 # PROJECT
+class ProjectQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        return self.filter(
+            models.Q(creator=user) | models.Q(id__in=user.invited_projects.values("id"))
+        )
+
+    def with_task_totals(self):
+        return self.annotate(
+            task_total=models.Count("tasks"),
+            task_completed=models.Count("tasks", filter=models.Q(tasks__status="done")),
+        )
+
+    def with_timezone(self):
+        return self.annotate(creator_timezone=models.F("creator__info__user_timezone"))
+
 class Project(models.Model):
     creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name="owned_projects")
     name = models.CharField(max_length=100)
@@ -26,10 +41,14 @@ class Project(models.Model):
     progress = models.IntegerField(default=0) 
     total_time = models.DurationField(default=timedelta)
     today_time = models.DurationField(default=timedelta)
+    today_date = models.DateField(null=True, blank=True)  # local day today_time belongs to
     deadline = models.DateField(null=True, blank=True)
     invited_users = models.ManyToManyField(User, related_name="invited_projects", blank=True)
     color = models.CharField(max_length=7, default="#3B82F6")
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ProjectQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -58,6 +77,13 @@ class Task(models.Model):
 
     due_date = models.DateField(null=True, blank=True) 
     progress = models.PositiveIntegerField(default=0)  
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["assigned_to", "id"], name="task_assignee_id_idx"),
+            models.Index(fields=["assigned_to", "updated_at"], name="task_assignee_updated_idx"),
+        ]
 
     def __str__(self):
         return f"[{self.status} | {self.progress}%] {self.text} ({self.priority}) → {self.assigned_to.username}"
@@ -67,6 +93,13 @@ class Shift(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="shifts")
     start_time = models.DateTimeField()
     end_time = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "start_time", "id"], name="shift_user_start_idx"),
+            models.Index(fields=["user", "updated_at"], name="shift_user_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.username}: {self.start_time} - {self.end_time}"
@@ -79,6 +112,18 @@ class ProjectTimeEntry(models.Model):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField(null=True, blank=True)
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "start_time", "id"], name="pte_user_start_idx"),
+            models.Index(fields=["user", "updated_at"], name="pte_user_updated_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # project rollups are updated by signals and must commit together with the entry
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username} - {self.project.name} ({self.start_time} - {self.end_time})"
@@ -90,10 +135,52 @@ class TaskTimeEntry(models.Model):
     shift = models.ForeignKey(Shift, on_delete=models.CASCADE, related_name="task_entries")
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "start_time", "id"], name="tte_user_start_idx"),
+            models.Index(fields=["user", "updated_at"], name="tte_user_updated_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username} - {self.task.text} ({self.start_time} - {self.end_time})"
 
+# DAILY TIME BUCKET
+class DailyTimeBucket(models.Model):
+    """Booked time per user, project, task and local day, maintained from the time entry writes."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="time_buckets")
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="time_buckets")
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="time_buckets", null=True, blank=True)  # null = project entries
+    date = models.DateField()
+    duration = models.DurationField(default=timedelta)
+    entries = models.IntegerField(default=0)  # entries starting on this day
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "project", "date"],
+                condition=models.Q(task__isnull=True),
+                name="bucket_unique_project_day",
+            ),
+            models.UniqueConstraint(
+                fields=["user", "project", "task", "date"],
+                condition=models.Q(task__isnull=False),
+                name="bucket_unique_task_day",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "date"], name="bucket_user_date_idx"),
+            models.Index(fields=["project", "date"], name="bucket_project_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.project.name} {self.date}: {self.duration}"
+
 # INVITATION
 class Invitation(models.Model):
     from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sent_invitations")
@@ -108,6 +195,9 @@ class Invitation(models.Model):
     ]
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
 
+    class Meta:
+        indexes = [models.Index(fields=["project", "to_user", "-timestamp"], name="invitation_project_user_idx")]
+
     def __str__(self):
         return f"{self.from_user} → {self.to_user} | {self.project.name} | {self.status}"
 
@@ -137,17 +227,78 @@ class Meeting(models.Model):
     text = models.CharField(max_length=255)
     from_date = models.DateTimeField()
     to_date = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["creator", "from_date", "id"], name="meeting_creator_from_idx")]
 
     def __str__(self):
         return f"{self.text} ({self.from_date} - {self.to_date})"
 
+# TOMBSTONE
+class Tombstone(models.Model):
+    """Records a deletion (or lost access) so delta sync can tell a user's clients to drop the object."""
+    # no FK constraint: tombstones are still written while a deleted user's rows cascade away
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name="tombstones")
+    model = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "deleted_at"], name="tombstone_user_deleted_idx")]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.model} {self.object_id} deleted at {self.deleted_at}"
+
 # USERIMAGE
+class ImageBlob(models.Model):
+    # one row per stored file; its row lock orders uploads reusing the file against its deletion
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
 class UserImage(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="images")
-    image_data = models.BinaryField()  # Stores the actual image data
+    sha256 = models.CharField(max_length=64, db_index=True)  # Key of the blob in the "user_images" storage
+    size = models.PositiveIntegerField(default=0)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    variant_sizes = models.JSONField(default=list, blank=True)  # Downscaled copies present in storage
     content_type = models.CharField(max_length=100)  # To store the MIME type
     type = models.CharField(max_length=50, choices=[("profile", "Profile"), ("background", "Background")])
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["user", "type", "id"], name="userimage_user_type_idx")]
+
     def __str__(self):
         return f"{self.user.username} - {self.type}"
+
+# OUTBOX EMAIL
+class OutboxEmail(models.Model):
+    """An email queued inside the request and delivered later by the send_outbox worker."""
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)  # also the lease of a claimed batch
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at", "id"], name="outbox_due_idx")]
+
+    def __str__(self):
+        return f"{self.to_email}: {self.subject} ({self.status})"
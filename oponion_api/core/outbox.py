@@ -0,0 +1,127 @@
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = getattr(settings, "OUTBOX_BATCH_SIZE", 50)
+OUTBOX_MAX_ATTEMPTS = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 6)
+OUTBOX_BACKOFF = getattr(settings, "OUTBOX_BACKOFF", timedelta(seconds=30))
+OUTBOX_MAX_BACKOFF = timedelta(hours=1)
+# a crashed worker's batch becomes due again after this long
+OUTBOX_LEASE = timedelta(minutes=5)
+
+
+def enqueue(to_email, subject, body, from_email=None):
+    return OutboxEmail.objects.create(to_email=to_email, subject=subject, body=body, from_email=from_email or "")
+
+
+def enqueue_many(messages):
+    """messages: iterable of (to_email, subject, body)"""
+    return OutboxEmail.objects.bulk_create(
+        [OutboxEmail(to_email=to_email, subject=subject, body=body) for to_email, subject, body in messages]
+    )
+
+
+def backoff(attempts):
+    return min(OUTBOX_BACKOFF * 2 ** (attempts - 1), OUTBOX_MAX_BACKOFF)
+
+
+def claim_batch(size):
+    """Lease up to `size` due emails. Concurrent workers skip rows another worker has locked."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:size]
+        )
+        if batch:
+            OutboxEmail.objects.filter(id__in=[email.id for email in batch]).update(next_attempt_at=now + OUTBOX_LEASE)
+    return batch
+
+
+def record_failure(email, error, now):
+    email.last_error = f"{type(error).__name__}: {error}"
+    if email.attempts >= OUTBOX_MAX_ATTEMPTS:
+        email.status = "failed"
+        logger.error("Giving up on outbox email %s after %s attempts: %s", email.id, email.attempts, email.last_error)
+    else:
+        email.next_attempt_at = now + backoff(email.attempts)
+
+
+def save_attempts(batch):
+    OutboxEmail.objects.bulk_update(batch, ["status", "attempts", "next_attempt_at", "last_error", "sent_at"])
+
+
+def send(message, connection):
+    try:
+        message.send()
+    except smtplib.SMTPServerDisconnected:
+        # the server dropped the connection (idle timeout, message limit): reconnect once and retry
+        connection.close()
+        connection.open()
+        message.send()
+
+
+def deliver(batch, connection):
+    now = timezone.now()
+    for email in batch:
+        message = EmailMessage(
+            email.subject,
+            email.body,
+            email.from_email or settings.DEFAULT_FROM_EMAIL,
+            [email.to_email],
+            connection=connection,
+        )
+        email.attempts += 1
+        try:
+            send(message, connection)
+        except Exception as error:
+            record_failure(email, error, now)
+        else:
+            email.status = "sent"
+            email.sent_at = now
+            email.last_error = ""
+    save_attempts(batch)
+
+
+def drain(batch_size=OUTBOX_BATCH_SIZE, max_batches=None):
+    """Send every due email over one SMTP connection. Returns (sent, failed) for this run."""
+    sent = failed = batches = 0
+    connection = None
+    try:
+        while max_batches is None or batches < max_batches:
+            batch = claim_batch(batch_size)
+            if not batch:
+                break
+            if connection is None:
+                connection = get_connection(fail_silently=False)
+                try:
+                    connection.open()
+                except Exception as error:
+                    # count the claimed batch as a failed attempt instead of leaving it leased
+                    now = timezone.now()
+                    for email in batch:
+                        email.attempts += 1
+                        record_failure(email, error, now)
+                    save_attempts(batch)
+                    logger.warning("Could not connect to the mail server: %s", error)
+                    failed += len(batch)
+                    connection = None
+                    break
+            deliver(batch, connection)
+            sent += sum(email.status == "sent" for email in batch)
+            failed += sum(email.status != "sent" for email in batch)
+            batches += 1
+    finally:
+        if connection is not None:
+            connection.close()
+    return sent, failed
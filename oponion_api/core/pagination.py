@@ -0,0 +1,107 @@
+import base64
+import binascii
+import json
+from datetime import date
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Offset-free cursor pagination over a unique ordering such as ("start_time", "id").
+
+    The cursor holds the sort key of the last row of the previous page, so every page
+    is a single index range scan and rows inserted meanwhile never shift the window.
+    Pagination is opt-in: without `cursor` or `limit` the full list is returned as before.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "limit"
+    order_query_param = "order"
+    page_size = 50
+    max_page_size = 500
+
+    def __init__(self, ordering):
+        self.ordering = tuple(ordering)
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.descending = request.query_params.get(self.order_query_param) == "desc"
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            values, self.descending = self.decode_cursor(cursor)
+            try:
+                queryset = queryset.filter(self.after(values))
+            except (DjangoValidationError, ValueError, TypeError):
+                raise NotFound("Invalid cursor")
+
+        prefix = "-" if self.descending else ""
+        rows = list(queryset.order_by(*(prefix + field for field in self.ordering))[: self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        self.page = rows[: self.limit]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(limit, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        cursor = self.encode_cursor([getattr(last, field) for field in self.ordering])
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def after(self, values):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        op = "lt" if self.descending else "gt"
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            equal = {self.ordering[j]: values[j] for j in range(i)}
+            condition |= Q(**equal, **{f"{field}__{op}": values[i]})
+        return condition
+
+    def encode_cursor(self, values):
+        payload = {
+            "v": [value.isoformat() if isinstance(value, date) else value for value in values],
+            "d": self.descending,
+        }
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            values, descending = payload["v"], bool(payload["d"])
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise NotFound("Invalid cursor")
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound("Invalid cursor")
+        return values, descending
+
+
+def paginated_response(request, queryset, serializer_class, ordering):
+    paginator = KeysetPagination(ordering)
+    page = paginator.paginate_queryset(queryset, request)
+    if page is None:
+        return Response(serializer_class(queryset, many=True).data)
+    return paginator.get_paginated_response(serializer_class(page, many=True).data)
@@ -0,0 +1,116 @@
+from datetime import timedelta
+
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .buckets import split_by_day
+from .models import DailyTimeBucket, ProjectTimeEntry, TaskTimeEntry
+from .rollups import get_timezone
+
+PERIODS = {
+    "day": TruncDay,
+    "week": TruncWeek,
+    "month": TruncMonth,
+}
+
+# group_by key -> {values() lookup: response key} per entry source
+GROUPINGS = {
+    "project": {
+        "user": {"user_id": "user_id", "user__username": "username"},
+        "project": {"project_id": "project_id", "project__name": "project_name"},
+    },
+    "task": {
+        "user": {"user_id": "user_id", "user__username": "username"},
+        "project": {"task__project_id": "project_id", "task__project__name": "project_name"},
+        "task": {"task_id": "task_id", "task__text": "task_text"},
+    },
+}
+
+BUCKET_GROUPINGS = {
+    "user": {"user_id": "user_id", "user__username": "username"},
+    "project": {"project_id": "project_id", "project__name": "project_name"},
+    "task": {"task_id": "task_id", "task__text": "task_text"},
+}
+
+
+def visible_entries(source, user):
+    # own entries plus everything booked on projects the user owns
+    if source == "task":
+        return TaskTimeEntry.objects.filter(Q(user=user) | Q(task__project__creator=user))
+    return ProjectTimeEntry.objects.filter(Q(user=user) | Q(project__creator=user))
+
+
+def visible_buckets(source, user):
+    return DailyTimeBucket.objects.filter(
+        Q(user=user) | Q(project__creator=user), task__isnull=(source == "project")
+    )
+
+
+def period_start(day, period):
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def time_report(user, source, group_by, period, project_id=None, start=None, end=None, now=None):
+    """
+    Closed time comes from the daily buckets (each user's local days), so the cost
+    grows with the number of days reported, not with the number of entries. Open
+    entries are not in the buckets yet and are split "until now" into the same local
+    days of their owner. `start` and `end` are inclusive dates.
+    """
+    now = now or timezone.now()
+    rows = {}
+
+    def collect(period_start, row, lookups, duration, entries):
+        names = {name: row[lookup] for lookup, name in lookups.items()}
+        result = rows.setdefault(
+            (period_start, *names.values()),
+            {"period": period_start.isoformat(), **names, "seconds": 0, "entries": 0},
+        )
+        result["seconds"] += int(duration.total_seconds())
+        result["entries"] += entries
+
+    buckets = visible_buckets(source, user)
+    if project_id:
+        buckets = buckets.filter(project_id=project_id)
+    if start:
+        buckets = buckets.filter(date__gte=start)
+    if end:
+        buckets = buckets.filter(date__lte=end)
+
+    lookups = {}
+    for key in group_by:
+        lookups.update(BUCKET_GROUPINGS[key])
+    period_field = F("date") if period == "day" else PERIODS[period]("date")
+    bucket_rows = (
+        buckets.annotate(period_start=period_field)
+        .values("period_start", *lookups)
+        .annotate(duration=Sum("duration"), entries=Sum("entries"))
+        .filter(Q(duration__gt=timedelta(0)) | Q(entries__gt=0))
+        .order_by()
+    )
+    for row in bucket_rows:
+        collect(row["period_start"], row, lookups, row["duration"], row["entries"])
+
+    if source == "project":
+        entries = visible_entries(source, user).filter(end_time__isnull=True, start_time__lte=now)
+        if project_id:
+            entries = entries.filter(project_id=project_id)
+
+        lookups = {}
+        for key in group_by:
+            lookups.update(GROUPINGS[source][key])
+        # at most one running entry per user, so this stays a short list
+        open_rows = entries.values("start_time", "user__info__user_timezone", *lookups)
+        for row in open_rows:
+            tz = get_timezone(row["user__info__user_timezone"])
+            for index, (day, duration) in enumerate(split_by_day(row["start_time"], now, tz)):
+                if (start and day < start) or (end and day > end):
+                    continue
+                collect(period_start(day, period), row, lookups, duration, int(index == 0))
+
+    return [rows[key] for key in sorted(rows, key=lambda key: tuple((part is None, part) for part in key))]
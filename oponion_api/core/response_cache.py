@@ -0,0 +1,93 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from . import metrics
+from .conditional import matches
+from .models import Project
+
+RESPONSE_CACHE_ALIAS = getattr(settings, "RESPONSE_CACHE_ALIAS", "default")
+RESPONSE_CACHE_TIMEOUT = getattr(settings, "RESPONSE_CACHE_TIMEOUT", 5 * 60)
+
+
+def response_cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+
+def version_key(scope, pk):
+    return f"resp-version:{scope}:{pk}"
+
+
+def current_versions(scopes):
+    """
+    Version tokens for (scope, pk) pairs. A missing token (never set, or evicted) is
+    recreated from the clock, so entries written under an older token never match again.
+    """
+    cache = response_cache()
+    keys = [version_key(scope, pk) for scope, pk in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(scope, pks):
+    cache = response_cache()
+    for pk in set(pks):
+        if pk is None:
+            continue
+        try:
+            cache.incr(version_key(scope, pk))
+        except ValueError:
+            # no token yet, so nothing can be cached under it
+            pass
+
+
+def cache_key(request, name, scopes, extra=()):
+    params = sorted((key, value) for key, values in request.query_params.lists() for value in values)
+    parts = [name, str(request.user.pk), repr(params), *map(str, current_versions(scopes)), *extra]
+    return f"resp:{name}:" + hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def cached_get(request, name, scopes, build, extra=()):
+    """
+    Per-user response cache in front of a read. `scopes` are the (scope, pk) version
+    tokens the response depends on; core/signals.py bumps them when the data changes.
+    """
+    key = cache_key(request, name, scopes, extra)
+    entry = response_cache().get(key)
+    if entry is not None:
+        metrics.incr(f"cache.{name}.hit")
+        etag, data = entry
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if etag and if_none_match and matches(etag, if_none_match):
+            return Response(status=304, headers={"ETag": etag})
+        return Response(data, headers={"ETag": etag} if etag else None)
+
+    metrics.incr(f"cache.{name}.miss")
+    response = build()
+    if response.status_code == 200:
+        response_cache().set(key, (response.get("ETag"), response.data), RESPONSE_CACHE_TIMEOUT)
+    return response
+
+
+def bump_after_commit(bumps):
+    """bumps: [(scope, pks)]"""
+    for scope, pks in bumps:
+        bump(scope, pks)
+    # a reader between the first bump and the commit may cache the old rows under the
+    # new version; the second bump retires that entry
+    transaction.on_commit(lambda: [bump(scope, pks) for scope, pks in bumps])
+
+
+def bump_projects(project_ids, extra_users=()):
+    project_ids = list(project_ids)
+    rows = Project.objects.filter(pk__in=project_ids).values_list("creator_id", "invited_users")
+    audience = {user_id for row in rows for user_id in row if user_id is not None} | set(extra_users)
+    bump_after_commit([("project", project_ids), ("projects", audience)])
@@ -0,0 +1,172 @@
+from collections import defaultdict, namedtuple
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db.models import DurationField, ExpressionWrapper, F, Q, QuerySet, Sum
+from django.utils import timezone
+
+from .models import Project, ProjectTimeEntry, Shift, Task, TaskTimeEntry, UserInformation
+
+# Which field of an entry points at the project its time is booked on.
+PROJECT_LOOKUPS = {
+    ProjectTimeEntry: "project_id",
+    TaskTimeEntry: "task__project_id",
+}
+
+Span = namedtuple("Span", "user_id project_id task_id start_time end_time")
+
+# owner model -> (ProjectTimeEntry lookup, TaskTimeEntry lookup) of the entries its delete cascades to
+CASCADE_LOOKUPS = {
+    Shift: ("shift", "shift"),
+    Task: (None, "task"),
+    Project: ("project", "task__project"),
+}
+
+ENTRY_DURATION = ExpressionWrapper(F("end_time") - F("start_time"), output_field=DurationField())
+
+
+def get_timezone(name):
+    if name:
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return timezone.get_default_timezone()
+
+
+def project_timezone(project_id):
+    # "today" of a project is the creator's local day
+    name = (
+        UserInformation.objects.filter(user__owned_projects=project_id)
+        .values_list("user_timezone", flat=True)
+        .first()
+    )
+    return get_timezone(name)
+
+
+def user_timezone(user_id):
+    name = UserInformation.objects.filter(user_id=user_id).values_list("user_timezone", flat=True).first()
+    return get_timezone(name)
+
+
+def day_bounds(day, tz):
+    start = datetime.combine(day, time.min, tzinfo=tz)
+    return start, datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz)
+
+
+def overlap(start_time, end_time, window_start, window_end):
+    return max(timedelta(0), min(end_time, window_end) - max(start_time, window_start))
+
+
+def stored_span(model, pk):
+    entries = model.objects.filter(pk=pk)
+    if model is TaskTimeEntry:
+        row = entries.values_list("user_id", "task__project_id", "task_id", "start_time", "end_time").first()
+    else:
+        row = entries.values_list("user_id", "project_id", "start_time", "end_time").first()
+        row = row and row[:2] + (None,) + row[2:]
+    return Span(*row) if row else None
+
+
+def entry_span(entry):
+    if isinstance(entry, TaskTimeEntry):
+        return Span(entry.user_id, entry.task.project_id, entry.task_id, entry.start_time, entry.end_time)
+    return Span(entry.user_id, entry.project_id, None, entry.start_time, entry.end_time)
+
+
+def origin_model(origin):
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+def is_time_cascade(origin):
+    """
+    Whether a delete started from `origin` removes time entries as a cascade from a shift,
+    task or project. Those entries are handled in one batch by the owner's pre_delete
+    instead of one rollup, bucket, tombstone and cache update per row.
+    """
+    return origin is not None and origin_model(origin) in CASCADE_LOOKUPS
+
+
+def cascaded_entries(owner):
+    """[(entry model, pk, Span)] for every time entry deleting `owner` cascades to, in two queries."""
+    project_lookup, task_lookup = CASCADE_LOOKUPS[type(owner)]
+    entries = []
+    if project_lookup:
+        rows = ProjectTimeEntry.objects.filter(**{project_lookup: owner}).values_list(
+            "pk", "user_id", "project_id", "start_time", "end_time"
+        )
+        entries += [(ProjectTimeEntry, pk, Span(user_id, project_id, None, *times)) for pk, user_id, project_id, *times in rows]
+    rows = TaskTimeEntry.objects.filter(**{task_lookup: owner}).values_list(
+        "pk", "user_id", "task__project_id", "task_id", "start_time", "end_time"
+    )
+    entries += [(TaskTimeEntry, pk, Span(*span)) for pk, *span in rows]
+    return entries
+
+
+def is_closed(span):
+    return (
+        span.project_id is not None
+        and span.start_time is not None
+        and span.end_time is not None
+        and span.end_time > span.start_time
+    )
+
+
+def apply_span(span, sign=1):
+    """Add (sign=1) or remove (sign=-1) a closed time span from the project rollups."""
+    apply_spans([span], sign)
+
+
+def apply_spans(spans, sign=1):
+    by_project = defaultdict(list)
+    for span in spans:
+        if is_closed(span):
+            by_project[span.project_id].append(span)
+
+    for project_id, project_spans in by_project.items():
+        tz = project_timezone(project_id)
+        today = timezone.localdate(timezone=tz)
+        window_start, window_end = day_bounds(today, tz)
+        duration = sum((span.end_time - span.start_time for span in project_spans), timedelta(0))
+        today_delta = sum(
+            (overlap(span.start_time, span.end_time, window_start, window_end) for span in project_spans),
+            timedelta(0),
+        )
+        add_to_project(project_id, today, duration * sign, today_delta * sign)
+
+
+def add_to_project(project_id, today, duration, today_delta):
+    projects = Project.objects.filter(pk=project_id)
+    for _ in range(2):
+        if projects.filter(today_date=today).update(
+            total_time=F("total_time") + duration,
+            today_time=F("today_time") + today_delta,
+            updated_at=timezone.now(),
+        ):
+            return
+        # first booking of the local day resets today_time; a concurrent writer
+        # that rolled over first makes this a no-op and we increment instead
+        if projects.filter(~Q(today_date=today) | Q(today_date__isnull=True)).update(
+            total_time=F("total_time") + duration,
+            today_time=max(today_delta, timedelta(0)),
+            today_date=today,
+            updated_at=timezone.now(),
+        ):
+            return
+
+
+def compute_project_time(project_id, tz, today):
+    total = timedelta(0)
+    today_total = timedelta(0)
+    window_start, window_end = day_bounds(today, tz)
+
+    for model, lookup in PROJECT_LOOKUPS.items():
+        entries = model.objects.filter(
+            **{lookup: project_id}, end_time__isnull=False, end_time__gt=F("start_time")
+        )
+        total += entries.aggregate(total=Sum(ENTRY_DURATION))["total"] or timedelta(0)
+        todays = entries.filter(start_time__lt=window_end, end_time__gt=window_start)
+        for start_time, end_time in todays.values_list("start_time", "end_time"):
+            today_total += overlap(start_time, end_time, window_start, window_end)
+
+    return total, today_total
@@ -0,0 +1,8 @@
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """OpenAPI bearer scheme for CachedJWTAuthentication; extensions only match their exact target class."""
+
+    target_class = "core.authentication.CachedJWTAuthentication"
+    name = "jwtAuth"
@@ -0,0 +1,91 @@
+import hashlib
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+
+from .models import Invitation
+
+# Below this length trigram indexes cannot help, so only prefixes are matched.
+MIN_SUBSTRING_LENGTH = 3
+
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# the invite dialog re-requests the directory on every open
+INVITABLE_CACHE_TIMEOUT = 30
+
+
+def user_match(query):
+    """
+    Filter for a typeahead query. Both lookups compile to UPPER(col) LIKE ..., which the
+    pg_trgm GIN and pattern_ops indexes from migration 0013 serve on PostgreSQL.
+    """
+    if len(query) < MIN_SUBSTRING_LENGTH:
+        return Q(username__istartswith=query) | Q(email__istartswith=query)
+    return Q(username__icontains=query) | Q(email__icontains=query)
+
+
+def rank_users(users, query):
+    """exact > prefix > substring, then shorter usernames first"""
+    rank = Case(
+        When(Q(username__iexact=query) | Q(email__iexact=query), then=Value(0)),
+        When(Q(username__istartswith=query) | Q(email__istartswith=query), then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+    return users.annotate(rank=rank).order_by("rank", Length("username"), "username", "id")
+
+
+def search_limit(value):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return SEARCH_LIMIT
+    return max(1, min(limit, MAX_SEARCH_LIMIT))
+
+
+def invitable_users(user, project=None):
+    """Everyone but the caller; for a project also minus creator, members and pending invitees."""
+    users = User.objects.exclude(id=user.id)
+    if project is not None:
+        users = users.exclude(id=project.creator_id).exclude(
+            id__in=project.invited_users.values("id")
+        ).exclude(
+            id__in=Invitation.objects.filter(project=project, status="pending").values("to_user_id")
+        )
+    return users
+
+
+def invitable_version_key(project_id):
+    return f"invitable:{project_id}:version"
+
+
+def invitable_version(project_id):
+    """
+    Bumped whenever membership or invitations of the project change. A missing token
+    (never set, or evicted) is recreated from the clock, never from a fixed start value,
+    so responses cached under an earlier token cannot match again.
+    """
+    key = invitable_version_key(project_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_invitable_version(project_id):
+    key = invitable_version_key(project_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # evicted: a fresh clock-based token is newer than anything cached before
+        cache.add(key, time.time_ns(), None)
+
+
+def invitable_cache_key(request, project_id):
+    raw = "|".join([str(request.user.pk), request.get_host(), request.get_full_path(), str(invitable_version(project_id))])
+    return "invitable:" + hashlib.sha1(raw.encode()).hexdigest()
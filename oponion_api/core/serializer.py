@@ -1,74 +1,129 @@
 from rest_framework import serializers
 from .models import Task, Invitation, Project, UserInformation, Meeting, UserImage, ProjectTimeEntry, TaskTimeEntry, Shift
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user_model
+from django.db.models import Case, Count, Q, When
+from django.utils import timezone
+from datetime import timedelta
+from .instrumentation import TimedSerializerMixin
+from .rollups import get_timezone, project_timezone
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Login with email or username. The user row is resolved with a single query and
+    the password is hashed exactly once; the pair is issued directly instead of
+    going through authenticate() (which would hash a second time).
+    """
+
     def validate(self, attrs):
         identifier = attrs.get("username")  
         password = attrs.get("password")
 
-        user = User.objects.filter(email=identifier).first()
-        if user is None:
-            user = User.objects.filter(username=identifier).first()
+        # an email match wins over a username match, as before
+        user = (
+            User.objects.filter(Q(email=identifier) | Q(username=identifier))
+            .order_by(Case(When(email=identifier, then=0), default=1), "pk")
+            .first()
+        )
 
-        if user is None or not user.check_password(password):
+        if user is None:
+            # hash anyway so unknown accounts cannot be told apart by response time
+            User().set_password(password)
+            raise serializers.ValidationError("No active account found with the given credentials")
+        if not user.check_password(password):
             raise serializers.ValidationError("No active account found with the given credentials")
 
         if not user.is_active:
             raise serializers.ValidationError("User account is disabled.")
 
-        data = super().validate({"username": user.username, "password": password})
-        data["id"] = user.id
+        self.user = user
+        refresh = self.get_token(user)
+        data = {"refresh": str(refresh), "access": str(refresh.access_token), "id": user.id}
+
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            record_last_login(user)
         return data
 
-class TaskSerializer(serializers.ModelSerializer):
+
+# last_login is informational; one bare UPDATE at most per interval keeps logins during
+# shift-start peaks from queueing on the same rows (no model save, no signals)
+LAST_LOGIN_INTERVAL = timedelta(minutes=1)
+
+
+def record_last_login(user):
+    now = timezone.now()
+    if user.last_login and now - user.last_login < LAST_LOGIN_INTERVAL:
+        return
+    User.objects.filter(pk=user.pk).update(last_login=now)
+    user.last_login = now
+
+class ModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    pass
+
+class TaskSerializer(ModelSerializer):
     class Meta:
         model = Task
         fields = '__all__'
 
-class InvitationSerializer(serializers.ModelSerializer):
+class InvitationSerializer(ModelSerializer):
     class Meta:
         model = Invitation
         fields = '__all__'
         read_only_fields = ['from_user', 'status', 'timestamp']
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(ModelSerializer):
     tasks = serializers.SerializerMethodField()
     
     class Meta:
         model = Project
         fields = '__all__'
-        read_only_fields = ['user']
+        read_only_fields = ['user', 'total_time', 'today_time', 'today_date']
+
+    def to_representation(self, project):
+        data = super().to_representation(project)
+        if hasattr(project, "creator_timezone"):
+            tz = get_timezone(project.creator_timezone)
+        else:
+            tz = project_timezone(project.id)
+        # today_time of a previous local day has not been rolled over yet
+        if project.today_date != timezone.localdate(timezone=tz):
+            data["today_time"] = self.fields["today_time"].to_representation(timedelta(0))
+        return data
 
     def get_tasks(self, project):
-        total = Task.objects.filter(project=project).count()
-        completed = Task.objects.filter(project=project, status='done').count()
+        if hasattr(project, "task_total"):
+            total, completed = project.task_total, project.task_completed
+        else:
+            totals = Task.objects.filter(project=project).aggregate(
+                total=Count("id"), completed=Count("id", filter=Q(status="done"))
+            )
+            total, completed = totals["total"], totals["completed"]
         return {
             "total": total,
             "completed": completed
         }
 
-class UserInformationSerializer(serializers.ModelSerializer):
+class UserInformationSerializer(ModelSerializer):
     class Meta:
         model = UserInformation
         fields = '__all__'
 
-class UserSelectSerializer(serializers.ModelSerializer):
+class UserSelectSerializer(ModelSerializer):
     class Meta:
         model = get_user_model()
         fields = ["id", "username", "email"] 
 
 
-class UserImageSerializer(serializers.ModelSerializer):
+class UserImageSerializer(ModelSerializer):
     class Meta:
         model = UserImage
         fields = '__all__'
-        read_only_fields = ('user', 'uploaded_at')
+        read_only_fields = ('user', 'sha256', 'size', 'width', 'height', 'variant_sizes', 'uploaded_at')
 
-class MeetingSerializer(serializers.ModelSerializer):
+class MeetingSerializer(ModelSerializer):
     creator = serializers.ReadOnlyField(source='creator.id')
     invited_users = serializers.PrimaryKeyRelatedField(
         many=True,
@@ -77,7 +132,7 @@ class MeetingSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Meeting
-        fields = ['id', 'creator', 'invited_users', 'text', 'from_date', 'to_date']
+        fields = ['id', 'creator', 'invited_users', 'text', 'from_date', 'to_date', 'updated_at']
 
     def validate(self, data):
         if data['to_date'] <= data['from_date']:
@@ -93,25 +148,25 @@ class MeetingSerializer(serializers.ModelSerializer):
         meeting.invited_users.set(invited)
         return meeting
 
-class ProjectTimeEntrySerializer(serializers.ModelSerializer):
+class ProjectTimeEntrySerializer(ModelSerializer):
     class Meta:
         model = ProjectTimeEntry
         fields = '__all__'
         read_only_fields = ['user']
 
-class TaskTimeEntrySerializer(serializers.ModelSerializer):
+class TaskTimeEntrySerializer(ModelSerializer):
     class Meta:
         model = TaskTimeEntry
         fields = '__all__'
         read_only_fields = ['user']
 
-class ShiftSerializer(serializers.ModelSerializer):
+class ShiftSerializer(ModelSerializer):
     project_entries = ProjectTimeEntrySerializer(many=True, read_only=True)
     task_entries = TaskTimeEntrySerializer(many=True, read_only=True)
 
     class Meta:
         model = Shift
-        fields = ['id', 'user', 'start_time', 'end_time', 'project_entries', 'task_entries']
+        fields = ['id', 'user', 'start_time', 'end_time', 'updated_at', 'project_entries', 'task_entries']
         read_only_fields = ['user']
 
     def validate(self, data):
@@ -121,3 +176,36 @@ class ShiftSerializer(serializers.ModelSerializer):
         return data
 
 
+
+class SyncShiftSerializer(ModelSerializer):
+    class Meta:
+        model = Shift
+        fields = ['id', 'user', 'start_time', 'end_time', 'updated_at']
+
+class BatchShiftSerializer(serializers.Serializer):
+    ref = serializers.CharField(required=False, max_length=100)
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField(required=False, allow_null=True)
+
+    def validate(self, data):
+        if data.get('end_time') is not None and data['end_time'] <= data['start_time']:
+            raise serializers.ValidationError("End time must be after start time")
+        return data
+
+class BatchEntrySerializer(BatchShiftSerializer):
+    shift = serializers.IntegerField(required=False)
+    shift_ref = serializers.CharField(required=False, max_length=100)
+
+    def validate(self, data):
+        data = super().validate(data)
+        if ('shift' in data) == ('shift_ref' in data):
+            raise serializers.ValidationError("Exactly one of shift or shift_ref is required")
+        return data
+
+class BatchProjectTimeEntrySerializer(BatchEntrySerializer):
+    project = serializers.IntegerField()
+    description = serializers.CharField(required=False, allow_blank=True, default="")
+
+class BatchTaskTimeEntrySerializer(BatchEntrySerializer):
+    task = serializers.IntegerField()
+    end_time = serializers.DateTimeField()
@@ -0,0 +1,353 @@
+from django.contrib.auth.models import User
+from django.core.signals import request_started
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import authentication, buckets, display, images, metrics, response_cache, rollups, search
+from .models import Invitation, Meeting, Project, ProjectTimeEntry, Shift, Task, TaskTimeEntry, Tombstone, UserImage
+from .sync import record_many_tombstones, record_tombstones
+
+
+# PROJECT TIME ROLLUPS / DAILY TIME BUCKETS
+@receiver(pre_save, sender=ProjectTimeEntry)
+@receiver(pre_save, sender=TaskTimeEntry)
+def remember_previous_span(sender, instance, raw=False, **kwargs):
+    instance._previous_span = None
+    if not raw and instance.pk is not None:
+        instance._previous_span = rollups.stored_span(sender, instance.pk)
+
+
+@receiver(post_save, sender=ProjectTimeEntry)
+@receiver(post_save, sender=TaskTimeEntry)
+def update_time_totals_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_span", None)
+    current = rollups.entry_span(instance)
+    if previous == current:
+        return
+
+    with transaction.atomic():
+        if previous:
+            rollups.apply_span(previous, sign=-1)
+            buckets.apply_span(previous, sign=-1)
+        rollups.apply_span(current)
+        buckets.apply_span(current)
+
+
+@receiver(post_delete, sender=ProjectTimeEntry)
+@receiver(post_delete, sender=TaskTimeEntry)
+def update_time_totals_on_delete(sender, instance, origin=None, **kwargs):
+    if rollups.is_time_cascade(origin):
+        # applied once for the whole cascade, see remove_cascaded_time
+        return
+    span = rollups.entry_span(instance)
+    rollups.apply_span(span, sign=-1)
+    buckets.apply_span(span, sign=-1)
+
+
+def cascaded_entries(sender, instance, origin):
+    """
+    The time entries deleting `instance` cascades to, fetched once and shared by the batch
+    handlers below; None unless `instance` is what the delete was started on. Tasks deleted
+    along with their project are covered by the project's own pre_delete.
+    """
+    if not rollups.is_time_cascade(origin) or sender is not rollups.origin_model(origin):
+        return None
+    if not hasattr(instance, "_cascaded_entries"):
+        instance._cascaded_entries = rollups.cascaded_entries(instance)
+    return instance._cascaded_entries
+
+
+@receiver(pre_delete, sender=Shift)
+@receiver(pre_delete, sender=Task)
+@receiver(pre_delete, sender=Project)
+def remove_cascaded_time(sender, instance, origin=None, **kwargs):
+    entries = cascaded_entries(sender, instance, origin)
+    if entries is None:
+        return
+    spans = [span for _, _, span in entries]
+    # a deleted project takes its totals and buckets along, a deleted task its buckets
+    if sender is not Project:
+        rollups.apply_spans(spans, sign=-1)
+    if sender is Shift:
+        buckets.apply_spans(spans, sign=-1)
+
+
+@receiver(post_save, sender=Task)
+def move_task_time(sender, instance, raw=False, **kwargs):
+    # the task's entries are booked on whatever project the task belongs to
+    previous = getattr(instance, "_previous_project", None)
+    if raw or previous is None or previous == instance.project_id:
+        return
+    spans = [
+        rollups.Span(user_id, previous, instance.pk, start_time, end_time)
+        for user_id, start_time, end_time in TaskTimeEntry.objects.filter(task=instance).values_list("user_id", "start_time", "end_time")
+    ]
+    moved = [span._replace(project_id=instance.project_id) for span in spans]
+    with transaction.atomic():
+        rollups.apply_spans(spans, sign=-1)
+        buckets.apply_spans(spans, sign=-1)
+        rollups.apply_spans(moved)
+        buckets.apply_spans(moved)
+
+
+# DELTA SYNC
+SYNC_KEYS = {
+    Project: "projects",
+    Task: "tasks",
+    Shift: "shifts",
+    ProjectTimeEntry: "project_entries",
+    TaskTimeEntry: "task_entries",
+    Meeting: "meetings",
+}
+
+
+def touch(model, pks):
+    # queryset updates skip auto_now
+    model.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=Project)
+@receiver(pre_delete, sender=Meeting)
+def remember_members(sender, instance, **kwargs):
+    # the invited_users rows are gone by post_delete
+    instance._sync_audience = [instance.creator_id, *instance.invited_users.values_list("id", flat=True)]
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Shift)
+@receiver(post_delete, sender=ProjectTimeEntry)
+@receiver(post_delete, sender=TaskTimeEntry)
+@receiver(post_delete, sender=Meeting)
+def record_deletion(sender, instance, origin=None, **kwargs):
+    if sender in (ProjectTimeEntry, TaskTimeEntry) and rollups.is_time_cascade(origin):
+        # recorded for the whole cascade by record_cascaded_deletions
+        return
+    audience = getattr(instance, "_sync_audience", None)
+    if audience is None:
+        audience = [instance.assigned_to_id] if sender is Task else [instance.user_id]
+    record_tombstones(SYNC_KEYS[sender], instance.pk, audience)
+
+
+@receiver(pre_delete, sender=Shift)
+@receiver(pre_delete, sender=Task)
+@receiver(pre_delete, sender=Project)
+def record_cascaded_deletions(sender, instance, origin=None, **kwargs):
+    entries = cascaded_entries(sender, instance, origin)
+    if not entries:
+        return
+    for model in (ProjectTimeEntry, TaskTimeEntry):
+        record_many_tombstones(
+            SYNC_KEYS[model], [(pk, [span.user_id]) for entry_model, pk, span in entries if entry_model is model]
+        )
+
+
+@receiver(pre_save, sender=Task)
+def remember_previous_assignee(sender, instance, raw=False, **kwargs):
+    instance._previous_assignee = instance._previous_project = None
+    if not raw and instance.pk is not None:
+        previous = Task.objects.filter(pk=instance.pk).values_list("assigned_to_id", "project_id").first()
+        if previous:
+            instance._previous_assignee, instance._previous_project = previous
+
+
+@receiver(post_save, sender=Task)
+def sync_task_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_assignee", None)
+    if previous and previous != instance.assigned_to_id:
+        record_tombstones("tasks", instance.pk, [previous])
+    # the project's task totals changed
+    touch(Project, [instance.project_id])
+
+
+@receiver(post_delete, sender=Task)
+def sync_task_deletion(sender, instance, **kwargs):
+    touch(Project, [instance.project_id])
+
+
+@receiver(m2m_changed, sender=Project.invited_users.through)
+@receiver(m2m_changed, sender=Meeting.invited_users.through)
+def sync_membership_change(sender, instance, action, reverse, model, pk_set, **kwargs):
+    owner = Project if sender is Project.invited_users.through else Meeting
+    if action == "pre_clear":
+        # pk_set is not provided for clear()
+        if reverse:
+            instance._cleared_members = list(getattr(instance, f"invited_{owner.__name__.lower()}s").values_list("id", flat=True))
+        else:
+            instance._cleared_members = list(instance.invited_users.values_list("id", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if action == "post_clear":
+        pk_set = getattr(instance, "_cleared_members", [])
+    if reverse:
+        memberships = [(owner_pk, instance.pk) for owner_pk in pk_set]
+    else:
+        memberships = [(instance.pk, user_pk) for user_pk in pk_set]
+
+    owner_pks = {owner_pk for owner_pk, _ in memberships}
+    touch(owner, owner_pks)
+    if action != "post_add":
+        # removed members lose access; creators keep seeing their own objects
+        creators = dict(owner.objects.filter(pk__in=owner_pks).values_list("pk", "creator_id"))
+        Tombstone.objects.bulk_create([
+            Tombstone(user_id=user_pk, model=SYNC_KEYS[owner], object_id=owner_pk)
+            for owner_pk, user_pk in memberships
+            if creators.get(owner_pk) != user_pk
+        ])
+
+
+# USER IMAGE BLOBS
+@receiver(post_delete, sender=UserImage)
+def release_image_blob(sender, instance, **kwargs):
+    digest = instance.sha256
+
+    if digest:
+        # blobs are shared between identical uploads
+        transaction.on_commit(lambda: images.release_blob(digest))
+
+
+# DISPLAY INFO CACHE
+@receiver(post_save, sender=UserImage)
+@receiver(post_delete, sender=UserImage)
+@receiver(post_save, sender=User)
+def invalidate_display_info(sender, instance, **kwargs):
+    user_id = instance.pk if sender is User else instance.user_id
+    # after commit, so a concurrent reader cannot cache the old row again
+    transaction.on_commit(lambda: display.invalidate(user_id))
+
+
+# INVITABLE USER DIRECTORY
+@receiver(post_save, sender=Invitation)
+@receiver(post_delete, sender=Invitation)
+def invalidate_invitable_on_invitation(sender, instance, **kwargs):
+    project_id = instance.project_id
+    transaction.on_commit(lambda: search.bump_invitable_version(project_id))
+
+
+@receiver(m2m_changed, sender=Project.invited_users.through)
+def invalidate_invitable_on_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        # user.invited_projects.add(...): pk_set holds the projects, clear() is recorded by sync_membership_change
+        project_ids = list(getattr(instance, "_cleared_members", []) if action == "post_clear" else pk_set)
+    else:
+        project_ids = [instance.pk]
+    transaction.on_commit(lambda: [search.bump_invitable_version(project_id) for project_id in project_ids])
+
+
+# AUTHENTICATED USER CACHE
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_auth_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    # drop now so this request's follow-ups see the change, and again once it is visible to everyone
+    authentication.invalidate(user_id)
+    transaction.on_commit(lambda: authentication.invalidate(user_id))
+
+
+# RESPONSE CACHE
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def cache_project_change(sender, instance, **kwargs):
+    response_cache.bump_projects([instance.pk], getattr(instance, "_sync_audience", [instance.creator_id]))
+
+
+@receiver(m2m_changed, sender=Project.invited_users.through)
+def cache_project_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        project_ids = list(getattr(instance, "_cleared_members", []) if action == "post_clear" else pk_set)
+        response_cache.bump_projects(project_ids, [instance.pk])
+    else:
+        removed = getattr(instance, "_cleared_members", []) if action == "post_clear" else pk_set
+        response_cache.bump_projects([instance.pk], removed or ())
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def cache_task_change(sender, instance, **kwargs):
+    assignees = [instance.assigned_to_id, getattr(instance, "_previous_assignee", None)]
+    response_cache.bump_after_commit([("task", [instance.pk]), ("tasks", assignees)])
+    # task totals are part of the project payload
+    response_cache.bump_projects([instance.project_id, getattr(instance, "_previous_project", None)])
+
+
+@receiver(post_save, sender=ProjectTimeEntry)
+@receiver(post_delete, sender=ProjectTimeEntry)
+@receiver(post_save, sender=TaskTimeEntry)
+@receiver(post_delete, sender=TaskTimeEntry)
+def cache_time_entry_change(sender, instance, raw=False, origin=None, **kwargs):
+    # total_time / today_time are rolled up into the project row with a queryset update
+    if raw or rollups.is_time_cascade(origin):
+        return
+    project_ids = {
+        span.project_id
+        for span in (getattr(instance, "_previous_span", None), rollups.entry_span(instance))
+        if span is not None
+    }
+    response_cache.bump_projects(project_ids)
+
+
+@receiver(pre_delete, sender=Shift)
+@receiver(pre_delete, sender=Task)
+@receiver(pre_delete, sender=Project)
+def cache_cascaded_time_change(sender, instance, origin=None, **kwargs):
+    entries = cascaded_entries(sender, instance, origin)
+    if entries:
+        response_cache.bump_projects({span.project_id for _, _, span in entries})
+
+
+@receiver(post_save, sender=Invitation)
+@receiver(post_delete, sender=Invitation)
+def cache_invitation_change(sender, instance, **kwargs):
+    response_cache.bump_projects([instance.project_id], [instance.to_user_id])
+
+
+@receiver(post_save, sender=Meeting)
+@receiver(post_delete, sender=Meeting)
+def cache_meeting_change(sender, instance, **kwargs):
+    audience = getattr(instance, "_sync_audience", None)
+    if audience is None:
+        audience = [instance.creator_id, *instance.invited_users.values_list("id", flat=True)]
+    response_cache.bump_after_commit([("meeting", [instance.pk]), ("meetings", audience)])
+
+
+@receiver(m2m_changed, sender=Meeting.invited_users.through)
+def cache_meeting_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    changed = list(getattr(instance, "_cleared_members", []) if action == "post_clear" else pk_set)
+    if reverse:
+        meetings = Meeting.objects.filter(pk__in=changed)
+        audience = {instance.pk}
+        for creator_id, member_id in meetings.values_list("creator_id", "invited_users"):
+            audience.update({creator_id, member_id})
+        response_cache.bump_after_commit([("meeting", changed), ("meetings", audience)])
+    else:
+        audience = {instance.creator_id, *changed, *instance.invited_users.values_list("id", flat=True)}
+        response_cache.bump_after_commit([("meeting", [instance.pk]), ("meetings", audience)])
+
+
+# DATABASE CONNECTIONS
+@receiver(request_started)
+def count_connection_reuse(sender, **kwargs):
+    # runs after Django's close_old_connections, so a live connection here is reused by this request
+    if connections["default"].connection is not None:
+        metrics.incr("db.checkout.hit")
+
+
+@receiver(connection_created)
+def count_new_connection(sender, connection, **kwargs):
+    # a fresh connect (and TLS handshake); with the native pool every checkout lands here
+    metrics.incr("db.checkout.miss")
@@ -0,0 +1,91 @@
+import base64
+import binascii
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Meeting, Project, ProjectTimeEntry, Shift, Task, TaskTimeEntry, Tombstone
+from .serializer import (
+    MeetingSerializer, ProjectSerializer, ProjectTimeEntrySerializer, SyncShiftSerializer,
+    TaskSerializer, TaskTimeEntrySerializer,
+)
+
+# Rows committed slightly after the cursor was taken are picked up by the next sync.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+TOMBSTONE_RETENTION = getattr(settings, "SYNC_TOMBSTONE_RETENTION", timedelta(days=30))
+
+
+def sync_querysets(user):
+    """key -> (queryset of rows visible to user, serializer class)"""
+    return {
+        "projects": (
+            Project.objects.visible_to(user).with_task_totals().with_timezone().prefetch_related(
+                Prefetch("invited_users", queryset=User.objects.only("id"))
+            ),
+            ProjectSerializer,
+        ),
+        "tasks": (Task.objects.filter(assigned_to=user), TaskSerializer),
+        "shifts": (Shift.objects.filter(user=user), SyncShiftSerializer),
+        "project_entries": (ProjectTimeEntry.objects.filter(user=user), ProjectTimeEntrySerializer),
+        "task_entries": (TaskTimeEntry.objects.filter(user=user), TaskTimeEntrySerializer),
+        "meetings": (
+            Meeting.objects.filter(Q(creator=user) | Q(invited_users=user)).distinct().prefetch_related(
+                Prefetch("invited_users", queryset=User.objects.only("id"))
+            ),
+            MeetingSerializer,
+        ),
+    }
+
+
+def record_tombstones(model, object_id, user_ids):
+    record_many_tombstones(model, [(object_id, user_ids)])
+
+
+def record_many_tombstones(model, deletions):
+    """deletions: [(object_id, user_ids)], written with one INSERT"""
+    Tombstone.objects.bulk_create([
+        Tombstone(user_id=user_id, model=model, object_id=object_id)
+        for object_id, user_ids in deletions
+        for user_id in set(user_ids)
+        if user_id
+    ])
+
+
+def encode_cursor(moment):
+    return base64.urlsafe_b64encode(moment.isoformat().encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        moment = parse_datetime(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        moment = None
+    if moment is None or timezone.is_naive(moment):
+        raise ValueError("Invalid sync cursor")
+    return moment
+
+
+def sync_changes(user, since=None):
+    now = timezone.now()
+    # tombstones older than the retention window are purged, so such clients start over
+    reset = since is None or since < now - TOMBSTONE_RETENTION
+    changed_after = None if reset else since - SYNC_OVERLAP
+
+    data = {"cursor": encode_cursor(now), "reset": reset}
+    for key, (queryset, serializer_class) in sync_querysets(user).items():
+        if changed_after is not None:
+            queryset = queryset.filter(updated_at__gte=changed_after)
+        data[key] = serializer_class(queryset, many=True).data
+
+    deleted = {}
+    if changed_after is not None:
+        tombstones = Tombstone.objects.filter(user=user, deleted_at__gte=changed_after)
+        for model, object_id in tombstones.values_list("model", "object_id"):
+            deleted.setdefault(model, []).append(object_id)
+    data["deleted"] = deleted
+    return data
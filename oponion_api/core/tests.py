@@ -1,3 +1,1565 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+import contextlib
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from smtplib import SMTPException, SMTPServerDisconnected
+from unittest import mock
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import get_connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase as DjangoTestCase, override_settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.models import User
+from django.utils import timezone
+from drf_spectacular.generators import SchemaGenerator
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import authentication, images, instrumentation, metrics, outbox, search, sync
+from .models import ImageBlob, Project, Task, Shift, ProjectTimeEntry, TaskTimeEntry, UserInformation, DailyTimeBucket, Meeting, UserImage, Invitation, OutboxEmail, Tombstone
+
+
+class TestCase(DjangoTestCase):
+    """The cache outlives the per-test rollback (and ids are reused), so each test starts empty."""
+
+    def run(self, result=None):
+        cache.clear()
+        return super().run(result)
+
+
+class ProjectListQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        self.other = User.objects.create_user(username="other", email="other@example.com", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_projects(self, count):
+        for i in range(count):
+            owned = Project.objects.create(creator=self.user, name=f"owned-{i}")
+            shared = Project.objects.create(creator=self.other, name=f"shared-{i}")
+            shared.invited_users.add(self.user)
+            for project in (owned, shared):
+                Task.objects.create(project=project, assigned_to=self.user, text="open")
+                Task.objects.create(project=project, assigned_to=self.user, text="done", status="done")
+
+    def test_list_query_count_is_constant(self):
+        self.create_projects(2)
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/projects/")
+        self.assertEqual(len(response.data), 4)
+
+        self.create_projects(20)
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/projects/")
+        self.assertEqual(len(response.data), 44)
+
+    def test_list_returns_task_totals_without_duplicates(self):
+        self.create_projects(1)
+        project = Project.objects.create(creator=self.user, name="both")
+        project.invited_users.add(self.user, self.other)
+
+        response = self.client.get("/api/projects/")
+
+        by_name = {p["name"]: p for p in response.data}
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(by_name["owned-0"]["tasks"], {"total": 2, "completed": 1})
+        self.assertEqual(by_name["shared-0"]["tasks"], {"total": 2, "completed": 1})
+        self.assertEqual(by_name["both"]["tasks"], {"total": 0, "completed": 0})
+
+    def test_detail_query_count_is_constant(self):
+        self.create_projects(1)
+        project = Project.objects.get(name="owned-0")
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/projects/", {"project_id": project.id})
+        self.assertEqual(response.data["tasks"], {"total": 2, "completed": 1})
+
+
+class ProjectTimeRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        UserInformation.objects.create(user=self.user, email="owner@example.com", user_timezone="Europe/Zurich")
+        self.project = Project.objects.create(creator=self.user, name="rollup")
+        self.task = Task.objects.create(project=self.project, assigned_to=self.user, text="task")
+        # midday of the creator's local day, so no entry crosses midnight
+        self.now = timezone.localtime(timezone=ZoneInfo("Europe/Zurich")).replace(hour=12, minute=0)
+        self.shift = Shift.objects.create(user=self.user, start_time=self.now - timedelta(hours=8))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertRollups(self, total, today):
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.total_time, total)
+        self.assertEqual(self.project.today_time, today)
+
+    def test_entries_update_rollups(self):
+        response = self.client.post("/api/project-time/", {
+            "project": self.project.id, "shift": self.shift.id,
+            "start_time": self.now - timedelta(hours=2), "end_time": self.now - timedelta(hours=1),
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertRollups(timedelta(hours=1), timedelta(hours=1))
+
+        TaskTimeEntry.objects.create(
+            user=self.user, task=self.task, shift=self.shift,
+            start_time=self.now - timedelta(minutes=30), end_time=self.now,
+        )
+        self.assertRollups(timedelta(minutes=90), timedelta(minutes=90))
+
+        self.client.patch("/api/project-time/", {
+            "entry_id": response.data["id"], "end_time": self.now - timedelta(minutes=30),
+        })
+        self.assertRollups(timedelta(hours=2), timedelta(hours=2))
+
+        self.client.delete(f"/api/project-time/?entry_id={response.data['id']}")
+        self.assertRollups(timedelta(minutes=30), timedelta(minutes=30))
+
+    def test_open_entry_counts_once_closed(self):
+        entry = ProjectTimeEntry.objects.create(
+            user=self.user, project=self.project, shift=self.shift, start_time=self.now - timedelta(hours=1),
+        )
+        self.assertRollups(timedelta(0), timedelta(0))
+
+        entry.end_time = self.now
+        entry.save()
+        self.assertRollups(timedelta(hours=1), timedelta(hours=1))
+
+    def test_earlier_days_only_count_towards_total(self):
+        ProjectTimeEntry.objects.create(
+            user=self.user, project=self.project, shift=self.shift,
+            start_time=self.now - timedelta(days=3, hours=1), end_time=self.now - timedelta(days=3),
+        )
+        self.assertRollups(timedelta(hours=1), timedelta(0))
+
+    def test_stale_today_time_is_rolled_over(self):
+        Project.objects.filter(id=self.project.id).update(
+            today_time=timedelta(hours=5), today_date=timezone.localdate() - timedelta(days=2)
+        )
+        response = self.client.get("/api/projects/", {"project_id": self.project.id})
+        self.assertEqual(response.data["today_time"], "00:00:00")
+
+        call_command("rollover_today_time", stdout=StringIO())
+        self.assertRollups(timedelta(0), timedelta(0))
+
+    def book(self, shift, count, task=None):
+        start = self.now - timedelta(hours=6)
+        for i in range(count):
+            if task:
+                TaskTimeEntry.objects.create(
+                    user=self.user, task=task, shift=shift,
+                    start_time=start + timedelta(minutes=2 * i), end_time=start + timedelta(minutes=2 * i + 1),
+                )
+            else:
+                ProjectTimeEntry.objects.create(
+                    user=self.user, project=self.project, shift=shift,
+                    start_time=start + timedelta(minutes=2 * i), end_time=start + timedelta(minutes=2 * i + 1),
+                )
+
+    def bucket_rows(self):
+        return list(
+            DailyTimeBucket.objects.filter(duration__gt=timedelta(0))
+            .order_by("date", "task_id")
+            .values_list("date", "task_id", "duration")
+        )
+
+    def test_cascaded_entries_leave_the_rollups_in_one_batch(self):
+        other = Shift.objects.create(user=self.user, start_time=self.now - timedelta(hours=8))
+        self.book(self.shift, 30)
+        self.book(self.shift, 30, self.task)
+        self.book(other, 5)
+        before = self.bucket_rows()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.shift.delete()
+
+        rollup_updates = [q for q in queries if q["sql"].startswith(('UPDATE "core_project"', 'UPDATE "core_dailytimebucket"'))]
+        self.assertLessEqual(len(rollup_updates), 3)
+        self.assertRollups(timedelta(minutes=5), timedelta(minutes=5))
+        incremental = self.bucket_rows()
+        self.assertNotEqual(incremental, before)
+        call_command("rebuild_time_buckets", stdout=StringIO())
+        self.assertEqual(self.bucket_rows(), incremental)
+
+        self.book(other, 10, self.task)
+        self.task.delete()
+        self.assertRollups(timedelta(minutes=5), timedelta(minutes=5))
+
+    def test_cascaded_delete_runs_constant_queries(self):
+        small = Shift.objects.create(user=self.user, start_time=self.now - timedelta(hours=8))
+        self.book(small, 2)
+        self.book(small, 2, self.task)
+        self.book(self.shift, 60)
+        self.book(self.shift, 60, self.task)
+
+        with CaptureQueriesContext(connection) as few:
+            small.delete()
+        with CaptureQueriesContext(connection) as many:
+            self.shift.delete()
+
+        self.assertEqual(len(many), len(few))
+        # every entry still reaches the sync clients as a deletion
+        self.assertEqual(Tombstone.objects.filter(model="project_entries").count(), 62)
+        self.assertEqual(Tombstone.objects.filter(model="task_entries").count(), 62)
+        self.assertRollups(timedelta(0), timedelta(0))
+
+    def test_reconcile_repairs_drift(self):
+        ProjectTimeEntry.objects.create(
+            user=self.user, project=self.project, shift=self.shift,
+            start_time=self.now - timedelta(hours=1), end_time=self.now,
+        )
+        Project.objects.filter(id=self.project.id).update(total_time=timedelta(hours=9))
+
+        call_command("reconcile_project_time", stdout=StringIO())
+        self.assertRollups(timedelta(hours=1), timedelta(hours=1))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="worker", email="worker@example.com", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.start = timezone.now() - timedelta(days=30)
+        for day in range(5):
+            Shift.objects.create(user=self.user, start_time=self.start + timedelta(days=day))
+
+    def test_walks_all_pages_while_rows_are_inserted(self):
+        response = self.client.get("/api/shifts/", {"limit": 2})
+        seen = [shift["id"] for shift in response.data["results"]]
+
+        # an older shift inserted mid-walk must not shift the remaining pages
+        Shift.objects.create(user=self.user, start_time=self.start - timedelta(days=1))
+
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen += [shift["id"] for shift in response.data["results"]]
+
+        expected = list(
+            Shift.objects.filter(start_time__gte=self.start).order_by("start_time", "id").values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_descending_order(self):
+        response = self.client.get("/api/shifts/", {"limit": 3, "order": "desc"})
+        first = [shift["id"] for shift in response.data["results"]]
+        response = self.client.get(response.data["next"])
+        second = [shift["id"] for shift in response.data["results"]]
+
+        expected = list(Shift.objects.order_by("-start_time", "-id").values_list("id", flat=True))
+        self.assertEqual(first + second, expected)
+        self.assertIsNone(response.data["next"])
+
+    def test_unpaginated_request_returns_plain_list(self):
+        response = self.client.get("/api/shifts/")
+        self.assertEqual(len(response.data), 5)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/shifts/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+
+class ShiftTimelineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="worker", email="worker@example.com", password="pw")
+        self.project = Project.objects.create(creator=self.user, name="timeline")
+        self.task = Task.objects.create(project=self.project, assigned_to=self.user, text="task")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.first_day = timezone.now().replace(hour=8, minute=0, second=0, microsecond=0) - timedelta(days=60)
+
+    def create_shifts(self, days, offset=0):
+        for day in range(offset, offset + days):
+            start = self.first_day + timedelta(days=day)
+            shift = Shift.objects.create(user=self.user, start_time=start, end_time=start + timedelta(hours=8))
+            ProjectTimeEntry.objects.create(
+                user=self.user, project=self.project, shift=shift, start_time=start, end_time=start + timedelta(hours=4)
+            )
+            TaskTimeEntry.objects.create(
+                user=self.user, task=self.task, shift=shift, start_time=start, end_time=start + timedelta(hours=1)
+            )
+
+    def get_range(self, days):
+        return self.client.get("/api/shifts/", {
+            "from": self.first_day.date().isoformat(),
+            "to": (self.first_day + timedelta(days=days - 1)).date().isoformat(),
+        })
+
+    def test_query_count_stays_flat(self):
+        self.create_shifts(7)
+        with self.assertNumQueries(5):
+            week = self.get_range(7)
+        self.assertEqual(len(week.data), 7)
+
+        self.create_shifts(24, offset=7)
+        with self.assertNumQueries(5):
+            month = self.get_range(31)
+        self.assertEqual(len(month.data), 31)
+        self.assertEqual(len(month.data[0]["project_entries"]), 1)
+        self.assertEqual(len(month.data[0]["task_entries"]), 1)
+
+    def test_range_bounds(self):
+        self.create_shifts(10)
+        response = self.get_range(3)
+        self.assertEqual(len(response.data), 3)
+
+        response = self.client.get("/api/shifts/", {"from": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+
+class TimeReportTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        self.member = User.objects.create_user(username="member", email="member@example.com", password="pw")
+        self.project = Project.objects.create(creator=self.owner, name="report")
+        self.task = Task.objects.create(project=self.project, assigned_to=self.member, text="task")
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.day = timezone.now().replace(hour=9, minute=0, second=0, microsecond=0) - timedelta(days=10)
+
+    def book(self, user, start, hours, task=False):
+        shift = Shift.objects.create(user=user, start_time=start)
+        end = start + timedelta(hours=hours) if hours else None
+        if task:
+            return TaskTimeEntry.objects.create(user=user, task=self.task, shift=shift, start_time=start, end_time=end)
+        return ProjectTimeEntry.objects.create(user=user, project=self.project, shift=shift, start_time=start, end_time=end)
+
+    def test_groups_by_user_project_and_day(self):
+        self.book(self.owner, self.day, 2)
+        self.book(self.owner, self.day + timedelta(hours=3), 1)
+        self.book(self.member, self.day, 4)
+        self.book(self.member, self.day + timedelta(days=1), 1)
+
+        response = self.client.get("/api/reports/time/", {"group_by": "user,project", "period": "day"})
+
+        rows = [(row["period"], row["username"], row["seconds"], row["entries"]) for row in response.data["rows"]]
+        day, next_day = self.day.date().isoformat(), (self.day + timedelta(days=1)).date().isoformat()
+        self.assertEqual(rows, [
+            (day, "owner", 3 * 3600, 2),
+            (day, "member", 4 * 3600, 1),
+            (next_day, "member", 3600, 1),
+        ])
+
+    def test_task_entries_by_week(self):
+        self.book(self.member, self.day, 1, task=True)
+        self.book(self.member, self.day + timedelta(days=1), 2, task=True)
+
+        response = self.client.get("/api/reports/time/", {"group_by": "task", "period": "week"})
+
+        self.assertEqual(response.data["source"], "task")
+        self.assertEqual(sum(row["seconds"] for row in response.data["rows"]), 3 * 3600)
+        self.assertEqual(response.data["rows"][0]["task_text"], "task")
+
+    def test_open_entry_counts_until_now(self):
+        self.book(self.owner, timezone.now() - timedelta(hours=2), None)
+
+        response = self.client.get("/api/reports/time/", {"period": "month"})
+
+        self.assertAlmostEqual(response.data["rows"][0]["seconds"], 2 * 3600, delta=60)
+
+    def test_only_visible_entries_are_reported(self):
+        stranger = User.objects.create_user(username="stranger", email="stranger@example.com", password="pw")
+        foreign = Project.objects.create(creator=stranger, name="foreign")
+        shift = Shift.objects.create(user=stranger, start_time=self.day)
+        ProjectTimeEntry.objects.create(
+            user=stranger, project=foreign, shift=shift, start_time=self.day, end_time=self.day + timedelta(hours=1)
+        )
+
+        response = self.client.get("/api/reports/time/")
+
+        self.assertEqual(response.data["rows"], [])
+
+    def test_invalid_grouping(self):
+        response = self.client.get("/api/reports/time/", {"group_by": "task", "source": "project"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_bounds_must_be_dates(self):
+        response = self.client.get("/api/reports/time/", {"from": self.day.isoformat()})
+        self.assertEqual(response.status_code, 400)
+
+    def test_days_are_the_entry_owners_local_days(self):
+        UserInformation.objects.create(user=self.member, email="member@example.com", user_timezone="Asia/Tokyo")
+        # 20:00 UTC is already the next day in Tokyo
+        late = self.day.replace(hour=20)
+        self.book(self.member, late, 1)
+        self.book(self.member, timezone.now().replace(microsecond=0) - timedelta(minutes=30), None)
+
+        response = self.client.get("/api/reports/time/", {"group_by": "user"})
+
+        tokyo = ZoneInfo("Asia/Tokyo")
+        periods = [row["period"] for row in response.data["rows"]]
+        self.assertIn(late.astimezone(tokyo).date().isoformat(), periods)
+        self.assertEqual(periods[-1], timezone.localdate(timezone=tokyo).isoformat())
+
+    def test_moving_a_task_moves_its_time(self):
+        self.book(self.member, self.day, 2, task=True)
+        other = Project.objects.create(creator=self.owner, name="other")
+
+        self.task.project = other
+        self.task.save()
+
+        self.project.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.project.total_time, timedelta(0))
+        self.assertEqual(other.total_time, timedelta(hours=2))
+        buckets = DailyTimeBucket.objects.filter(task=self.task, duration__gt=timedelta(0))
+        self.assertEqual(set(buckets.values_list("project_id", flat=True)), {other.id})
+
+
+class DailyTimeBucketTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="worker", email="worker@example.com", password="pw")
+        UserInformation.objects.create(user=self.user, email="worker@example.com", user_timezone="Europe/Zurich")
+        self.project = Project.objects.create(creator=self.user, name="buckets")
+        self.task = Task.objects.create(project=self.project, assigned_to=self.user, text="task")
+        self.evening = datetime(2025, 3, 3, 22, 0, tzinfo=ZoneInfo("Europe/Zurich"))
+        self.shift = Shift.objects.create(user=self.user, start_time=self.evening)
+
+    def buckets(self):
+        return list(
+            DailyTimeBucket.objects.order_by("date", "task_id")
+            .filter(Q(duration__gt=timedelta(0)) | Q(entries__gt=0))
+            .values_list("date", "task_id", "duration", "entries")
+        )
+
+    def test_entry_crossing_midnight_is_split(self):
+        entry = ProjectTimeEntry.objects.create(
+            user=self.user, project=self.project, shift=self.shift,
+            start_time=self.evening, end_time=self.evening + timedelta(hours=3),
+        )
+        self.assertEqual(self.buckets(), [
+            (date(2025, 3, 3), None, timedelta(hours=2), 1),
+            (date(2025, 3, 4), None, timedelta(hours=1), 0),
+        ])
+
+        entry.end_time = self.evening + timedelta(hours=1)
+        entry.save()
+        self.assertEqual(self.buckets(), [(date(2025, 3, 3), None, timedelta(hours=1), 1)])
+
+        entry.delete()
+        self.assertEqual(self.buckets(), [])
+
+    def test_rebuild_matches_incremental_buckets(self):
+        ProjectTimeEntry.objects.create(
+            user=self.user, project=self.project, shift=self.shift,
+            start_time=self.evening, end_time=self.evening + timedelta(hours=5),
+        )
+        TaskTimeEntry.objects.create(
+            user=self.user, task=self.task, shift=self.shift,
+            start_time=self.evening - timedelta(hours=2), end_time=self.evening,
+        )
+        incremental = self.buckets()
+
+        DailyTimeBucket.objects.update(duration=timedelta(hours=99))
+        call_command("rebuild_time_buckets", "--chunk-size", "1", stdout=StringIO())
+
+        self.assertEqual(self.buckets(), incremental)
+        self.assertEqual(len(incremental), 3)
+
+
+class TimeEntryExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="worker", email="worker@example.com", password="pw")
+        self.project = Project.objects.create(creator=self.user, name="Payroll, Inc.")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        start = timezone.now() - timedelta(days=1)
+        shift = Shift.objects.create(user=self.user, start_time=start)
+        for hour in range(3):
+            ProjectTimeEntry.objects.create(
+                user=self.user, project=self.project, shift=shift,
+                start_time=start + timedelta(hours=hour), end_time=start + timedelta(hours=hour, minutes=30),
+            )
+
+    def test_csv_is_streamed_with_project_names(self):
+        response = self.client.get("/api/export/time-entries/", {"kind": "project", "output": "csv"})
+
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:5], ["id", "user_id", "username", "project_id", "project_name"])
+        self.assertEqual(len(lines), 4)
+        self.assertIn('"Payroll, Inc."', lines[1])
+
+    def test_ndjson_shifts(self):
+        response = self.client.get("/api/export/time-entries/", {"kind": "shift", "output": "ndjson"})
+
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["username"], "worker")
+
+    def test_unknown_kind(self):
+        response = self.client.get("/api/export/time-entries/", {"kind": "meetings"})
+        self.assertEqual(response.status_code, 400)
+
+
+class TimeEntryBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="mobile", email="mobile@example.com", password="pw")
+        self.project = Project.objects.create(creator=self.user, name="offline")
+        self.task = Task.objects.create(project=self.project, assigned_to=self.user, text="task")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.start = timezone.now() - timedelta(days=5)
+
+    def payload(self, shifts):
+        data = {"shifts": [], "project_entries": [], "task_entries": []}
+        for i in range(shifts):
+            start = self.start + timedelta(days=i)
+            data["shifts"].append({"ref": f"s{i}", "start_time": start, "end_time": start + timedelta(hours=8)})
+            data["project_entries"].append({
+                "shift_ref": f"s{i}", "project": self.project.id,
+                "start_time": start, "end_time": start + timedelta(hours=2),
+            })
+            data["task_entries"].append({
+                "shift_ref": f"s{i}", "task": self.task.id,
+                "start_time": start + timedelta(hours=2), "end_time": start + timedelta(hours=3),
+            })
+        return data
+
+    def test_batch_is_written_in_bulk(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.post("/api/time/batch/", self.payload(2), format="json")
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post("/api/time/batch/", self.payload(40), format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r["status"] for r in response.data["shifts"]], ["created"] * 40)
+        shift = Shift.objects.get(id=response.data["shifts"][3]["id"])
+        self.assertEqual(shift.project_entries.count(), 1)
+        self.assertEqual(shift.task_entries.get().id, response.data["task_entries"][3]["id"])
+        # 20x the items, same queries; only the four buckets shared with the first batch need their own UPDATE
+        self.assertLessEqual(len(large), len(small) + 4)
+
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.total_time, timedelta(hours=3) * 42)
+        self.assertEqual(DailyTimeBucket.objects.filter(task=self.task).count(), 40)
+
+    def test_invalid_item_rejects_whole_batch(self):
+        data = self.payload(2)
+        data["task_entries"][1]["task"] = 999999
+        data["project_entries"][0]["shift_ref"] = "missing"
+
+        response = self.client.post("/api/time/batch/", data, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["task_entries"][0]["status"], "valid")
+        self.assertIn("task", response.data["task_entries"][1]["errors"])
+        self.assertIn("shift_ref", response.data["project_entries"][0]["errors"])
+        self.assertFalse(Shift.objects.exists())
+
+    def test_non_object_body_is_rejected(self):
+        response = self.client.post("/api/time/batch/", [1, 2], format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_shifts_without_refs(self):
+        data = self.payload(3)
+        for shift in data["shifts"]:
+            del shift["ref"]
+        data["project_entries"] = data["task_entries"] = []
+
+        response = self.client.post("/api/time/batch/", data, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r["status"] for r in response.data["shifts"]], ["created"] * 3)
+
+    def test_duplicate_refs_are_rejected(self):
+        data = self.payload(2)
+        data["shifts"][1]["ref"] = "s0"
+
+        response = self.client.post("/api/time/batch/", data, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("ref", response.data["shifts"][1]["errors"])
+
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="phone", email="phone@example.com", password="pw")
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        self.project = Project.objects.create(creator=self.owner, name="shared")
+        self.project.invited_users.add(self.user)
+        self.task = Task.objects.create(project=self.project, assigned_to=self.user, text="task")
+        self.shift = Shift.objects.create(user=self.user, start_time=timezone.now())
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # move the fixtures out of the sync overlap window
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        for model in (Project, Task, Shift):
+            model.objects.update(updated_at=an_hour_ago)
+
+    def sync(self, cursor=None):
+        response = self.client.get("/api/sync/", {"since": cursor} if cursor else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_full_then_delta(self):
+        full = self.sync()
+        self.assertTrue(full["reset"])
+        self.assertEqual([p["id"] for p in full["projects"]], [self.project.id])
+        self.assertEqual(len(full["tasks"]), 1)
+        self.assertEqual(len(full["shifts"]), 1)
+
+        empty = self.sync(full["cursor"])
+        self.assertFalse(empty["reset"])
+        self.assertEqual(empty["tasks"], [])
+        self.assertEqual(empty["projects"], [])
+        self.assertEqual(empty["deleted"], {})
+
+        self.task.status = "done"
+        self.task.save()
+        shift_id = self.shift.id
+        self.shift.delete()
+        delta = self.sync(empty["cursor"])
+
+        self.assertEqual([t["id"] for t in delta["tasks"]], [self.task.id])
+        # task totals of the project changed as well
+        self.assertEqual([p["id"] for p in delta["projects"]], [self.project.id])
+        self.assertEqual(delta["shifts"], [])
+        self.assertEqual(delta["deleted"], {"shifts": [shift_id]})
+
+    def test_lost_membership_is_a_deletion(self):
+        cursor = self.sync()["cursor"]
+
+        self.project.invited_users.remove(self.user)
+        delta = self.sync(cursor)
+
+        self.assertEqual(delta["projects"], [])
+        self.assertEqual(delta["deleted"], {"projects": [self.project.id]})
+
+    def test_project_deletion_reaches_members(self):
+        cursor = self.sync()["cursor"]
+        project_id, task_id = self.project.id, self.task.id
+
+        self.project.delete()
+        delta = self.sync(cursor)
+
+        self.assertEqual(delta["deleted"]["projects"], [project_id])
+        self.assertEqual(delta["deleted"]["tasks"], [task_id])
+
+    def test_old_cursor_forces_reset(self):
+        cursor = sync.encode_cursor(timezone.now() - timedelta(days=365))
+        self.assertTrue(self.sync(cursor)["reset"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/sync/", {"since": "nope"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="poller", email="poller@example.com", password="pw")
+        self.project = Project.objects.create(creator=self.user, name="polled")
+        self.task = Task.objects.create(project=self.project, assigned_to=self.user, text="task")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        metrics.reset()
+
+    def test_unchanged_list_is_not_modified(self):
+        first = self.client.get("/api/projects/")
+        etag = first["ETag"]
+
+        # without the response cache the validator alone answers
+        cache.clear()
+        with self.assertNumQueries(1):
+            second = self.client.get("/api/projects/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second["ETag"], etag)
+        self.assertEqual(metrics.snapshot()["hit_rates"]["etag.projects"], 0.5)
+
+    def test_changes_invalidate_the_etag(self):
+        etag = self.client.get("/api/task/")["ETag"]
+
+        self.task.status = "done"
+        self.task.save()
+        response = self.client.get("/api/task/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        self.task.delete()
+        response = self.client.get("/api/task/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [])
+
+    def test_etag_depends_on_query(self):
+        Shift.objects.create(user=self.user, start_time=timezone.now())
+        etag = self.client.get("/api/shifts/")["ETag"]
+
+        response = self.client.get("/api/shifts/", {"limit": 1}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_meeting_membership_change_invalidates(self):
+        other = User.objects.create_user(username="other", email="other@example.com", password="pw")
+        meeting = Meeting.objects.create(
+            creator=self.user, text="standup", from_date=timezone.now(), to_date=timezone.now() + timedelta(hours=1)
+        )
+        etag = self.client.get("/api/meeting/")["ETag"]
+
+        meeting.invited_users.add(other)
+        response = self.client.get("/api/meeting/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["invited_users"], [other.id])
+
+    def test_metrics_require_staff(self):
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 403)
+
+
+class ImageStorageTestCase(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        storages = override_settings(STORAGES={
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+            "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+            "user_images": {
+                "BACKEND": "django.core.files.storage.FileSystemStorage",
+                "OPTIONS": {"location": self.media},
+            },
+        })
+        storages.enable()
+        self.addCleanup(storages.disable)
+        cache.clear()
+
+        self.user = User.objects.create_user(username="painter", email="painter@example.com", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def png(self, width=4, height=4, mode="RGBA", color=(200, 40, 40, 128)):
+        buffer = BytesIO()
+        Image.new(mode, (width, height), color if mode == "RGBA" else 0).save(buffer, "PNG")
+        return buffer.getvalue()
+
+    def upload(self, data=None, image_type="profile", content_type="image/png"):
+        upload = SimpleUploadedFile("avatar.png", self.png() if data is None else data, content_type=content_type)
+        return self.client.post("/api/userImage/", {"file": upload, "type": image_type}, format="multipart")
+
+
+class UserImageStorageTests(ImageStorageTestCase):
+    def test_upload_is_stored_under_its_hash(self):
+        data = self.png()
+        response = self.upload(data)
+
+        self.assertEqual(response.status_code, 201)
+        image = UserImage.objects.get()
+        self.assertEqual(image.sha256, hashlib.sha256(data).hexdigest())
+        self.assertEqual(image.size, len(data))
+        self.assertEqual(images.read_blob(image.sha256), data)
+
+    def test_content_type_comes_from_the_bytes(self):
+        buffer = BytesIO()
+        Image.new("RGB", (4, 4)).save(buffer, "JPEG")
+        self.assertEqual(self.upload(buffer.getvalue(), content_type="text/html").status_code, 201)
+        self.assertEqual(UserImage.objects.get().content_type, "image/jpeg")
+
+    def test_rejects_uploads_that_are_not_images(self):
+        response = self.upload(b"<script>alert(document.domain)</script>", content_type="text/html")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UserImage.objects.exists())
+        self.assertEqual(self.upload(self.png()[:40]).status_code, 400)
+
+    def test_identical_uploads_share_one_blob(self):
+        data = self.png()
+        self.upload(data, "profile")
+        self.upload(data, "background")
+        digest = hashlib.sha256(data).hexdigest()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete("/api/userImage/?type=profile")
+        self.assertTrue(images.image_storage().exists(images.blob_path(digest)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete("/api/userImage/?type=background")
+        self.assertFalse(images.image_storage().exists(images.blob_path(digest)))
+        self.assertFalse(ImageBlob.objects.filter(sha256=digest).exists())
+
+    def test_reupload_before_release_keeps_the_blob(self):
+        data = self.png()
+        self.upload(data)
+        digest = hashlib.sha256(data).hexdigest()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.delete("/api/userImage/?type=profile")
+        # an identical upload lands between the delete and its deferred release
+        self.upload(data)
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(images.read_blob(digest), data)
+
+
+class UserImageServingTests(ImageStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.data = self.png(10, 10)
+        self.url = self.upload(self.data).data["image"]
+        self.anonymous = APIClient()
+
+    def test_json_endpoints_return_the_image_url(self):
+        digest = hashlib.sha256(self.data).hexdigest()
+        self.assertEqual(images.unsign_url_token(self.url.rstrip("/").rsplit("/", 1)[1])[0], digest)
+        self.assertEqual(self.client.get("/api/userImage/?type=profile").data["image"], self.url)
+        self.assertEqual(self.client.get(f"/api/infoForDisplay/?userID={self.user.id}").data["profile_image"], self.url)
+
+    def test_serves_raw_bytes_with_cache_headers(self):
+        response = self.anonymous.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.data)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(response["X-Content-Type-Options"], "nosniff")
+        self.assertIn("immutable", response["Cache-Control"])
+
+        again = self.anonymous.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_range_requests(self):
+        response = self.anonymous.get(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.data[10:20])
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.data)}")
+
+        self.assertEqual(self.anonymous.get(self.url, HTTP_RANGE="bytes=-5").content, self.data[-5:])
+        self.assertEqual(self.anonymous.get(self.url, HTTP_RANGE=f"bytes={len(self.data) + 100}-").status_code, 416)
+        stale = self.anonymous.get(self.url, HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"other"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_unknown_digest(self):
+        token = images.sign_url_token("0" * 64)
+        self.assertEqual(self.anonymous.get(f"/api/images/{token}/").status_code, 404)
+
+    def test_rejects_bare_tampered_and_expired_links(self):
+        digest = hashlib.sha256(self.data).hexdigest()
+        self.assertEqual(self.anonymous.get(f"/api/images/{digest}/").status_code, 403)
+        self.assertEqual(self.anonymous.get(self.url.replace(digest, "f" * 64)).status_code, 403)
+
+        expired = images.sign_url_token(digest, now=time.time() - images.IMAGE_URL_MAX_AGE - images.IMAGE_URL_WINDOW)
+        self.assertEqual(self.anonymous.get(f"/api/images/{expired}/").status_code, 403)
+
+    def test_links_issued_in_one_window_are_identical(self):
+        now = int(time.time()) // images.IMAGE_URL_WINDOW * images.IMAGE_URL_WINDOW
+        self.assertEqual(images.sign_url_token("a" * 64, now), images.sign_url_token("a" * 64, now + 60))
+
+
+class UserImageVariantTests(ImageStorageTestCase):
+    def test_upload_renders_variants_up_to_the_original_size(self):
+        self.upload(self.png(800, 400))
+
+        image = UserImage.objects.get()
+        self.assertEqual((image.width, image.height), (800, 400))
+        self.assertEqual(image.variant_sizes, [32, 64, 256])
+        with images.open_path(images.variant_path(image.sha256, 64, "jpg")) as blob:
+            self.assertEqual(Image.open(blob).size, (64, 32))
+
+        self.upload(self.png(50, 50))
+        self.assertEqual(UserImage.objects.last().variant_sizes, [32])
+
+    def test_missing_variant_file_falls_back_to_the_original(self):
+        data = self.png(300, 300)
+        url = self.upload(data).data["image"]
+        image = UserImage.objects.get()
+        images.image_storage().delete(images.variant_path(image.sha256, 64, "jpg"))
+
+        response = APIClient().get(url + "?size=64")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(b"".join(response.streaming_content), data)
+
+    def test_display_endpoint_serves_the_smallest_fitting_variant(self):
+        self.upload(self.png(800, 800))
+        anonymous = APIClient()
+
+        url = self.client.get(f"/api/infoForDisplay/?userID={self.user.id}").data["profile_image"]
+        self.assertTrue(url.endswith("?size=64"))
+        response = anonymous.get(url, HTTP_ACCEPT="image/webp,*/*")
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertIn("Accept", response["Vary"])
+        self.assertEqual(Image.open(BytesIO(b"".join(response.streaming_content))).size, (64, 64))
+
+        url = self.client.get(f"/api/infoForDisplay/?userID={self.user.id}&size=100").data["profile_image"]
+        self.assertTrue(url.endswith("?size=256"))
+        self.assertEqual(anonymous.get(url)["Content-Type"], "image/jpeg")
+
+        url = self.client.get(f"/api/infoForDisplay/?userID={self.user.id}&size=1000").data["profile_image"]
+        self.assertNotIn("?size", url)
+
+    def test_stored_non_images_are_only_served_as_downloads(self):
+        # rows migrated from before uploads were checked
+        digest, size = images.store_bytes(b"<script>alert(document.domain)</script>")
+        UserImage.objects.create(user=self.user, sha256=digest, size=size, content_type="text/html", type="profile")
+
+        url = self.client.get(f"/api/infoForDisplay/?userID={self.user.id}").data["profile_image"]
+        response = APIClient().get(url)
+
+        self.assertEqual(response["Content-Type"], "application/octet-stream")
+        self.assertTrue(response["Content-Disposition"].startswith("attachment"))
+        self.assertEqual(response["Content-Security-Policy"], "sandbox")
+        self.assertEqual(response["X-Content-Type-Options"], "nosniff")
+        self.assertEqual(b"".join(response.streaming_content), b"<script>alert(document.domain)</script>")
+        ranged = APIClient().get(url, HTTP_RANGE="bytes=0-7")
+        self.assertEqual((ranged.status_code, ranged["Content-Type"]), (206, "application/octet-stream"))
+
+    def test_backfill_command(self):
+        self.upload(self.png(300, 300))
+        UserImage.objects.update(width=None, variant_sizes=[])
+
+        call_command("build_image_variants", stdout=StringIO())
+
+        self.assertEqual(UserImage.objects.get().variant_sizes, [32, 64, 256])
+
+
+class DisplayInfoBatchTests(ImageStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.members = [
+            User.objects.create_user(username=f"member{i}", email=f"member{i}@example.com", password="pw")
+            for i in range(5)
+        ]
+        for member in self.members[:3]:
+            digest, size = images.store_bytes(member.username.encode())
+            UserImage.objects.create(user=member, sha256=digest, size=size, content_type="image/png", type="profile")
+
+    def ids(self, users):
+        return ",".join(str(user.id) for user in users)
+
+    def test_constant_queries_and_cached_second_call(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/infoForDisplay/batch/?ids={self.ids(self.members)},999999")
+
+        self.assertEqual([row["username"] for row in response.data], [f"member{i}" for i in range(5)])
+        self.assertIsNotNone(response.data[0]["profile_image"])
+        self.assertIsNone(response.data[4]["profile_image"])
+
+        with self.assertNumQueries(0):
+            self.client.get(f"/api/infoForDisplay/batch/?ids={self.ids(self.members)}")
+
+    def test_image_upload_invalidates_the_cache(self):
+        member = self.members[4]
+        self.client.get(f"/api/infoForDisplay/?userID={member.id}")
+
+        client = APIClient()
+        client.force_authenticate(member)
+        avatar = self.png()
+        with self.captureOnCommitCallbacks(execute=True):
+            upload = SimpleUploadedFile("a.png", avatar, content_type="image/png")
+            client.post("/api/userImage/", {"file": upload, "type": "profile"}, format="multipart")
+
+        response = self.client.get(f"/api/infoForDisplay/batch/?ids={member.id}")
+        self.assertIn(hashlib.sha256(avatar).hexdigest(), response.data[0]["profile_image"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            client.delete("/api/userImage/?type=profile")
+        self.assertIsNone(self.client.get(f"/api/infoForDisplay/?userID={member.id}").data["profile_image"])
+
+    def test_rejects_bad_ids(self):
+        self.assertEqual(self.client.get("/api/infoForDisplay/batch/?ids=1,x").status_code, 400)
+        self.assertEqual(self.client.get("/api/infoForDisplay/batch/").status_code, 400)
+
+
+class UserSearchTests(TestCase):
+    def setUp(self):
+        for username, email in [
+            ("annabelle", "belle@example.com"),
+            ("hanna", "h@example.com"),
+            ("anna", "anna@example.com"),
+            ("joanna", "jo@example.com"),
+            ("ann", "x@example.com"),
+        ]:
+            User.objects.create_user(username=username, email=email, password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(username="anna"))
+
+    def usernames(self, **params):
+        return [row["username"] for row in self.client.get("/api/user-search/", params).data]
+
+    def test_ranks_exact_then_prefix_then_substring(self):
+        self.assertEqual(self.usernames(q="anna"), ["anna", "annabelle", "hanna", "joanna"])
+
+    def test_short_queries_match_prefixes_only(self):
+        self.assertEqual(self.usernames(q="an"), ["ann", "anna", "annabelle"])
+
+    def test_limit_and_user_id(self):
+        self.assertEqual(self.usernames(q="anna", limit=2), ["anna", "annabelle"])
+        hanna = User.objects.get(username="hanna")
+        self.assertEqual(self.usernames(user_ID=hanna.id), ["hanna"])
+        self.assertEqual(self.client.get("/api/user-search/", {"q": "  "}).status_code, 400)
+
+
+class InvitableUserDirectoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        self.member = User.objects.create_user(username="member", email="member@example.com", password="pw")
+        self.invitee = User.objects.create_user(username="invitee", email="invitee@example.com", password="pw")
+        self.free = User.objects.create_user(username="freelancer", email="free@example.com", password="pw")
+        self.project = Project.objects.create(creator=self.owner, name="directory")
+        self.project.invited_users.add(self.member)
+        Invitation.objects.create(from_user=self.owner, to_user=self.invitee, project=self.project)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def usernames(self, **params):
+        response = self.client.get("/api/users/selectable/", {"project_id": self.project.id, **params})
+        data = response.data["results"] if "results" in response.data else response.data
+        return [row["username"] for row in data]
+
+    def test_excludes_members_and_pending_invitees(self):
+        self.assertEqual(self.usernames(), ["freelancer"])
+        self.assertEqual(self.usernames(q="fre", limit=10), ["freelancer"])
+        self.assertEqual(self.usernames(q="zzz"), [])
+
+    def test_cache_is_dropped_when_invitations_change(self):
+        self.assertEqual(self.usernames(), ["freelancer"])
+        with self.assertNumQueries(1):
+            # the project lookup; the directory itself comes from the cache
+            self.usernames()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Invitation.objects.filter(to_user=self.invitee).update(status="declined")
+            Invitation.objects.get(to_user=self.invitee).save()
+        self.assertEqual(self.usernames(), ["freelancer", "invitee"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.invited_users.add(self.free)
+        self.assertEqual(self.usernames(), ["invitee"])
+
+    def test_evicted_version_does_not_revive_stale_entries(self):
+        self.assertEqual(self.usernames(), ["freelancer"])
+        cache.delete(search.invitable_version_key(self.project.id))
+
+        # the bump after an eviction must not land back on a token an old entry was cached under
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.invited_users.add(self.free)
+        self.assertEqual(self.usernames(), [])
+
+    def test_requires_a_visible_project(self):
+        outsider = APIClient()
+        outsider.force_authenticate(self.free)
+        self.assertEqual(outsider.get("/api/users/selectable/", {"project_id": self.project.id}).status_code, 404)
+
+
+class InvitedUsersWithStatusTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        self.project = Project.objects.create(creator=self.owner, name="status")
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def invite(self, user, status):
+        return Invitation.objects.create(from_user=self.owner, to_user=user, project=self.project, status=status)
+
+    def test_members_and_pending_invitees_in_one_query(self):
+        users = {
+            name: User.objects.create_user(username=name, email=f"{name}@example.com", password="pw")
+            for name in ["accepted", "pending", "declined", "direct", "reinvited"]
+        }
+        self.invite(users["accepted"], "accepted")
+        self.invite(users["pending"], "pending")
+        self.invite(users["declined"], "declined")
+        # duplicate invitations used to raise MultipleObjectsReturned
+        self.invite(users["reinvited"], "declined")
+        self.invite(users["reinvited"], "accepted")
+        self.project.invited_users.add(users["accepted"], users["direct"], users["reinvited"])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/projects/{self.project.id}/invited-users/")
+
+        self.assertEqual(
+            [(row["name"], row["invitation_status"], row["is_member"]) for row in response.data],
+            [
+                ("accepted", "accepted", True),
+                ("direct", "unbekannt", True),
+                ("pending", "pending", False),
+                ("reinvited", "accepted", True),
+            ],
+        )
+
+    def test_unknown_project(self):
+        self.assertEqual(self.client.get("/api/projects/999999/invited-users/").status_code, 404)
+
+    def test_hidden_from_outsiders(self):
+        member = User.objects.create_user(username="member", email="member@example.com", password="pw")
+        self.project.invited_users.add(member)
+        outsider = APIClient()
+        outsider.force_authenticate(User.objects.create_user(username="outsider", email="out@example.com", password="pw"))
+
+        self.assertEqual(outsider.get(f"/api/projects/{self.project.id}/invited-users/").status_code, 404)
+        self.client.force_authenticate(member)
+        self.assertEqual(self.client.get(f"/api/projects/{self.project.id}/invited-users/").status_code, 200)
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        self.project = Project.objects.create(creator=self.owner, name="outbox")
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_invite_queues_instead_of_sending(self):
+        guest = User.objects.create_user(username="guest", email="guest@example.com", password="pw")
+
+        response = self.client.post("/api/invitations/send/", {"to_user_id": guest.id, "project_id": self.project.id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox, [])
+        queued = OutboxEmail.objects.get()
+        self.assertEqual(queued.to_email, "guest@example.com")
+        self.assertIn(str(Invitation.objects.get().token), queued.body)
+
+    def test_drain_sends_batches_over_one_connection(self):
+        outbox.enqueue_many((f"user{i}@example.com", "Hallo", "Text") for i in range(7))
+
+        with mock.patch("core.outbox.get_connection", wraps=get_connection) as connect:
+            call_command("send_outbox", "--batch-size", "3", stdout=StringIO())
+
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(len(mail.outbox), 7)
+        self.assertFalse(OutboxEmail.objects.exclude(status="sent").exists())
+        self.assertEqual(outbox.drain(), (0, 0))
+
+    def test_failures_back_off_and_give_up(self):
+        email = outbox.enqueue("guest@example.com", "Hallo", "Text")
+
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=SMTPException("down")):
+            self.assertEqual(outbox.drain(), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ("pending", 1))
+            self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=20))
+            self.assertIn("down", email.last_error)
+            # not due yet
+            self.assertEqual(outbox.drain(), (0, 0))
+
+            OutboxEmail.objects.update(next_attempt_at=timezone.now(), attempts=outbox.OUTBOX_MAX_ATTEMPTS - 1)
+            with self.assertLogs("core.outbox", "ERROR") as logs:
+                outbox.drain()
+            email.refresh_from_db()
+            self.assertEqual(email.status, "failed")
+            self.assertIn(f"Giving up on outbox email {email.id}", logs.output[0])
+
+        self.assertEqual(outbox.drain(), (0, 0))
+        self.assertEqual(mail.outbox, [])
+
+    def test_unreachable_server_counts_as_a_failed_attempt(self):
+        email = outbox.enqueue("guest@example.com", "Hallo", "Text")
+
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.open", side_effect=OSError("refused")), \
+                self.assertLogs("core.outbox", "WARNING") as logs:
+            self.assertEqual(outbox.drain(), (0, 1))
+        self.assertIn("refused", logs.output[0])
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("pending", 1))
+        self.assertIn("refused", email.last_error)
+        # retried after the backoff, not after the much longer lease
+        self.assertLess(email.next_attempt_at, timezone.now() + outbox.OUTBOX_LEASE)
+
+    def test_reconnects_when_the_server_disconnects(self):
+        outbox.enqueue_many((f"user{i}@example.com", "Hallo", "Text") for i in range(2))
+        send_messages = mock.Mock(side_effect=[SMTPServerDisconnected("gone"), 1, 1])
+
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", send_messages), \
+                mock.patch("django.core.mail.backends.locmem.EmailBackend.open") as reopen:
+            self.assertEqual(outbox.drain(), (2, 0))
+
+        self.assertEqual(send_messages.call_count, 3)
+        self.assertEqual(reopen.call_count, 2)
+
+    def test_worker_survives_a_failed_drain(self):
+        with mock.patch("core.management.commands.send_outbox.drain", side_effect=[OperationalError("gone"), (1, 0), KeyboardInterrupt]), \
+                mock.patch("core.management.commands.send_outbox.time.sleep"), \
+                self.assertLogs("core.management.commands.send_outbox", "ERROR"), \
+                self.assertRaises(KeyboardInterrupt):
+            out = StringIO()
+            call_command("send_outbox", "--loop", stdout=out)
+        self.assertIn("Sent 1 email(s)", out.getvalue())
+
+
+class BulkInvitationTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        self.project = Project.objects.create(creator=self.owner, name="team")
+        self.team = [
+            User.objects.create_user(username=f"dev{i}", email=f"dev{i}@example.com", password="pw")
+            for i in range(30)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_invites_many_users_in_constant_queries(self):
+        member, pending = self.team[0], self.team[1]
+        self.project.invited_users.add(member)
+        Invitation.objects.create(from_user=self.owner, to_user=pending, project=self.project)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/api/invitations/bulk/", {
+                "project_id": self.project.id,
+                "user_ids": [user.id for user in self.team[:20]] + [self.owner.id, 999999],
+                "emails": ["DEV25@example.com", "nobody@example.com"],
+            }, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertLessEqual(len(queries), 8)
+        self.assertEqual(len(response.data["invited"]), 19)
+        self.assertIn(self.team[25].id, response.data["invited"])
+        self.assertEqual(
+            sorted((row["id"], row["reason"]) for row in response.data["skipped"]),
+            sorted([(member.id, "member"), (pending.id, "pending"), (self.owner.id, "member")]),
+        )
+        self.assertEqual(response.data["not_found"], [999999, "nobody@example.com"])
+        self.assertEqual(Invitation.objects.filter(project=self.project, status="pending").count(), 20)
+        self.assertEqual(OutboxEmail.objects.count(), 19)
+        self.assertTrue(OutboxEmail.objects.filter(to_email="dev25@example.com").exists())
+
+    def test_requires_access_to_the_project(self):
+        client = APIClient()
+        client.force_authenticate(self.team[0])
+        response = client.post("/api/invitations/bulk/", {"project_id": self.project.id, "user_ids": [self.team[1].id]}, format="json")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(client.post("/api/invitations/bulk/", {"project_id": self.project.id}, format="json").status_code, 400)
+
+    def test_rejects_a_body_that_is_not_an_object(self):
+        for body in ([self.team[0].id], "dev0@example.com"):
+            self.assertEqual(self.client.post("/api/invitations/bulk/", body, format="json").status_code, 400)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.PBKDF2PasswordHasher"])
+class LoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="shiftlead", email="lead@example.com", password="correct horse")
+        self.client = APIClient()
+
+    def login(self, identifier, password="correct horse"):
+        return self.client.post("/api/login/", {"username": identifier, "password": password}, format="json")
+
+    def test_login_hashes_the_password_once(self):
+        with mock.patch.object(PBKDF2PasswordHasher, "encode", autospec=True, side_effect=PBKDF2PasswordHasher.encode) as encode:
+            response = self.login("lead@example.com")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(response.data["id"], self.user.id)
+        self.assertEqual(str(AccessToken(response.data["access"])["user_id"]), str(self.user.id))
+        self.assertEqual(self.login("shiftlead").status_code, 200)
+
+    def test_rejects_bad_credentials(self):
+        self.assertEqual(self.login("lead@example.com", "wrong").status_code, 400)
+        self.assertEqual(self.login("nobody").status_code, 400)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.login("shiftlead").status_code, 400)
+
+    def test_email_match_wins_over_username(self):
+        other = User.objects.create_user(username="lead@example.com", email="x@example.com", password="other")
+        self.assertEqual(self.login("lead@example.com").data["id"], self.user.id)
+        self.assertEqual(self.login("x@example.com", "other").data["id"], other.id)
+
+    def test_last_login_is_throttled(self):
+        self.login("shiftlead")
+        first = User.objects.get(pk=self.user.pk).last_login
+        self.assertIsNotNone(first)
+
+        self.login("shiftlead")
+        self.assertEqual(User.objects.get(pk=self.user.pk).last_login, first)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # the test settings use LocMemCache, which the authentication cache refuses as not shared
+        patcher = mock.patch.object(authentication, "LOCAL_BACKENDS", ())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username="cached", email="cached@example.com", password="old password")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def auth_queries(self, path="/api/metrics/"):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        return response, [query for query in queries if "auth_user" in query["sql"]]
+
+    def test_steady_state_skips_the_user_query(self):
+        response, queries = self.auth_queries()
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(len(queries), 1)
+
+        response, queries = self.auth_queries()
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(queries, [])
+
+    def test_password_reset_and_deactivation_invalidate(self):
+        self.auth_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/password/reset", {"old_password": "old password", "new_password": "new password"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.auth_queries()[1]), 1)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.auth_queries()[0].status_code, 401)
+
+    def test_caches_only_the_authentication_fields(self):
+        self.auth_queries()
+        version = authentication.current_version(cache, self.user.id)
+        data = cache.get(authentication.cache_key(self.user.id, version))
+
+        self.assertEqual(set(data) - {"password_digest"}, set(authentication.AUTH_FIELDS))
+        self.assertNotIn(self.user.password, data.values())
+        user = authentication.load(data)
+        self.assertEqual((user.pk, user.username), (self.user.id, "cached"))
+        self.assertIn("password", user.get_deferred_fields())
+
+    def test_entry_written_before_a_save_is_never_read(self):
+        version = authentication.current_version(cache, self.user.id)
+        stale = authentication.dump(self.user)
+        self.user.is_active = False
+        self.user.save()
+        # a slow request that loaded the row before the save stores it afterwards
+        cache.set(authentication.cache_key(self.user.id, version), stale)
+
+        self.assertEqual(self.auth_queries()[0].status_code, 401)
+
+    def test_process_local_cache_is_bypassed(self):
+        with mock.patch.object(authentication, "LOCAL_BACKENDS", (LocMemCache,)):
+            self.assertEqual(len(self.auth_queries()[1]), 1)
+            self.assertEqual(len(self.auth_queries()[1]), 1)
+
+
+class SchemaTests(TestCase):
+    def test_cached_jwt_is_documented_as_bearer_auth(self):
+        errors = StringIO()
+        with contextlib.redirect_stderr(errors):
+            schema = SchemaGenerator().get_schema(request=None, public=True)
+
+        self.assertEqual(schema["components"]["securitySchemes"]["jwtAuth"]["scheme"], "bearer")
+        self.assertNotIn("could not resolve authenticator", errors.getvalue())
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", email="owner@example.com", password="pw")
+        self.member = User.objects.create_user(username="member", email="member@example.com", password="pw")
+        self.project = Project.objects.create(creator=self.owner, name="cached")
+        self.project.invited_users.add(self.member)
+        self.task = Task.objects.create(project=self.project, assigned_to=self.member, text="cached task")
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+        metrics.reset()
+
+    def test_second_poll_is_served_from_the_cache(self):
+        first = self.client.get("/api/projects/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/projects/")
+        self.assertEqual(second.data, first.data)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/projects/", HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+        self.assertEqual(metrics.snapshot()["hit_rates"]["cache.projects"], round(2 / 3, 4))
+
+    def test_query_params_are_part_of_the_key(self):
+        self.client.get("/api/task/", {"project_id": self.project.id, "priority": "low"})
+        with self.assertNumQueries(0):
+            self.client.get("/api/task/", {"priority": "low", "project_id": self.project.id})
+        response = self.client.get("/api/task/", {"project_id": 999999})
+        self.assertEqual(response.data, [])
+
+    def test_task_change_invalidates_task_and_project_reads(self):
+        self.client.get("/api/task/")
+        self.client.get("/api/projects/")
+        self.client.get("/api/projects/", {"project_id": self.project.id})
+
+        self.task.status = "done"
+        self.task.save()
+
+        self.assertEqual(self.client.get("/api/task/").data[0]["status"], "done")
+        self.assertEqual(self.client.get("/api/projects/").data[0]["tasks"]["completed"], 1)
+        self.assertEqual(self.client.get("/api/projects/", {"project_id": self.project.id}).data["tasks"]["completed"], 1)
+
+    def test_membership_and_meeting_changes_invalidate(self):
+        outsider = User.objects.create_user(username="outsider", email="outsider@example.com", password="pw")
+        client = APIClient()
+        client.force_authenticate(outsider)
+        self.assertEqual(client.get("/api/projects/").data, [])
+        self.assertEqual(client.get("/api/meeting/").data, [])
+
+        self.project.invited_users.add(outsider)
+        meeting = Meeting.objects.create(
+            creator=self.owner, text="planning", from_date=timezone.now(), to_date=timezone.now() + timedelta(hours=1)
+        )
+        meeting.invited_users.add(outsider)
+
+        self.assertEqual(len(client.get("/api/projects/").data), 1)
+        self.assertEqual(len(client.get("/api/meeting/").data), 1)
+
+        meeting.delete()
+        self.assertEqual(client.get("/api/meeting/").data, [])
+
+    def test_time_entries_invalidate_project_totals(self):
+        self.client.get("/api/projects/", {"project_id": self.project.id})
+        start = timezone.now() - timedelta(hours=2)
+        shift = Shift.objects.create(user=self.member, start_time=start)
+        ProjectTimeEntry.objects.create(
+            user=self.member, project=self.project, shift=shift, start_time=start, end_time=start + timedelta(hours=1)
+        )
+
+        data = self.client.get("/api/projects/", {"project_id": self.project.id}).data
+        self.assertEqual(data["total_time"], "01:00:00")
+
+
+class DatabaseProfileTests(TestCase):
+    def load_production_settings(self, **env):
+        env.setdefault("USER_IMAGE_ROOT", "/var/data/user_images")
+        with mock.patch.dict(os.environ, env):
+            from oponion_api import settings_production
+            return importlib.reload(settings_production)
+
+    def test_production_keeps_connections_alive(self):
+        profile = self.load_production_settings(DB_CONN_MAX_AGE="120")
+        database = profile.DATABASES["default"]
+        self.assertEqual(database["CONN_MAX_AGE"], 120)
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+        self.assertNotIn("pool", database["OPTIONS"])
+        self.assertNotIn("CERT", database)
+
+    def test_pool_size_comes_from_the_environment(self):
+        profile = self.load_production_settings(DB_POOL_MIN_SIZE="2", DB_POOL_MAX_SIZE="8")
+        database = profile.DATABASES["default"]
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+        self.assertEqual(database["OPTIONS"]["pool"]["min_size"], 2)
+        self.assertEqual(database["OPTIONS"]["pool"]["max_size"], 8)
+
+    def test_several_workers_require_a_shared_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.load_production_settings(WEB_CONCURRENCY="2")
+
+        profile = self.load_production_settings(WEB_CONCURRENCY="2", REDIS_URL="redis://cache:6379/0")
+        self.assertEqual(profile.CACHES["default"]["BACKEND"], "django.core.cache.backends.redis.RedisCache")
+
+    def test_images_need_persistent_storage(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.load_production_settings(USER_IMAGE_ROOT="")
+
+        profile = self.load_production_settings(USER_IMAGE_ROOT="", USER_IMAGE_STORAGE="storages.backends.s3.S3Storage")
+        self.assertFalse(profile.DEBUG)
+
+    def test_reused_connections_are_counted(self):
+        admin = User.objects.create_user(username="ops", password="pw", is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        metrics.reset()
+
+        client.get("/api/metrics/")
+        response = client.get("/api/metrics/")
+        self.assertGreaterEqual(response.data["counters"]["db.checkout.hit"], 1)
+
+
+class RequestInstrumentationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="timed", email="timed@example.com", password="pw")
+        Project.objects.create(creator=self.user, name="timed")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        metrics.reset()
+
+    def timings(self, response):
+        timings = {}
+        for part in response["Server-Timing"].split(", "):
+            name, *fields = part.split(";")
+            timings[name] = dict(field.split("=", 1) for field in fields)
+        return timings
+
+    def test_server_timing_reports_queries_and_phases(self):
+        self.user.is_staff = True
+        self.user.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/projects/")
+
+        timings = self.timings(response)
+        self.assertEqual(timings["db"]["desc"], f'"{len(queries)} queries"')
+        self.assertEqual(set(timings), {"db", "serialize", "view", "total"})
+        self.assertGreater(float(timings["serialize"]["dur"]), 0)
+        self.assertGreaterEqual(float(timings["total"]["dur"]), float(timings["view"]["dur"]))
+
+    def test_each_request_is_logged_as_json(self):
+        with self.assertLogs("core.instrumentation", "INFO") as logs:
+            self.client.get("/api/projects/")
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["route"], "api/projects/")
+        self.assertEqual(line["status"], 200)
+        self.assertNotIn("over_budget", line)
+
+    def test_server_timing_is_staff_only_unless_enabled(self):
+        self.assertFalse(self.client.get("/api/projects/").has_header("Server-Timing"))
+        with mock.patch.object(instrumentation, "REQUEST_SERVER_TIMING", True):
+            self.assertTrue(self.client.get("/api/projects/").has_header("Server-Timing"))
+
+    def test_streamed_queries_are_logged_when_the_stream_closes(self):
+        shift = Shift.objects.create(user=self.user, start_time=timezone.now() - timedelta(hours=2), end_time=timezone.now())
+        with self.assertLogs("core.instrumentation", "INFO") as logs:
+            response = self.client.get("/api/export/time-entries/", {"kind": "shift", "output": "ndjson"})
+            self.assertEqual(logs.records, [])
+            with CaptureQueriesContext(connection) as streamed:
+                self.assertIn(str(shift.id).encode(), b"".join(response.streaming_content))
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertTrue(line["streaming"])
+        self.assertGreaterEqual(line["queries"], len(streamed))
+        self.assertGreater(len(streamed), 0)
+
+    def test_requests_over_budget_are_flagged(self):
+        with mock.patch.object(instrumentation, "REQUEST_QUERY_BUDGET", 0):
+            with self.assertLogs("core.instrumentation", "WARNING") as logs:
+                self.client.get("/api/projects/")
+
+        self.assertEqual(json.loads(logs.records[0].getMessage())["over_budget"], ["queries"])
+        self.assertEqual(metrics.snapshot()["counters"]["budget.queries"], 1)
+
+
+class BenchmarkCommandTests(ImageStorageTestCase):
+    def test_seed_and_benchmark(self):
+        call_command(
+            "seed_data", users=12, projects=3, members=4, tasks=2, shifts=3, entries=2, images=1, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.filter(username__startswith="seed-").count(), 12)
+        self.assertEqual(Shift.objects.count(), 36)
+        # derived rows are rebuilt after the bulk inserts
+        self.assertTrue(DailyTimeBucket.objects.exists())
+        self.assertFalse(Project.objects.filter(time_entries__isnull=False, total_time=timedelta(0)).exists())
+        with self.assertRaises(CommandError):
+            call_command("seed_data", users=1, stdout=StringIO())
+
+        output = os.path.join(self.media, "bench.json")
+        shifts_before = Shift.objects.count()
+        call_command("bench_api", iterations=2, warmup=0, routes=["projects/", "POST shifts/", "images/"], output=output, stdout=StringIO())
+
+        with open(output) as result_file:
+            report = json.load(result_file)
+        self.assertEqual(report["results"]["GET projects/"]["status"], 200)
+        self.assertEqual(report["results"]["POST shifts/"]["status"], 201)
+        self.assertEqual(report["results"]["GET images/<token>/"]["status"], 200)
+        self.assertEqual(set(report["results"]["GET projects/"]), {"status", "p50_ms", "p95_ms", "mean_ms", "queries", "peak_kb"})
+        self.assertEqual(report["uncovered_routes"], [])
+        # writes are rolled back
+        self.assertEqual(Shift.objects.count(), shifts_before)
@@ -5,7 +5,9 @@ from .views import (
     TaskView, InvitationView, UserSearchView, UserInformationView, 
     MyTokenRefreshView, list_invitable_users, invite_user, confirm_invitation, 
     invited_users_with_status, MeetingView, reset_password, UserImageView,
-    ShiftView, ProjectTimeEntryView, TaskTimeEntryView, infoForDisplay
+    ShiftView, ProjectTimeEntryView, TaskTimeEntryView, infoForDisplay,
+    TimeReportView, export_time_entries, TimeEntryBatchView, SyncView, metrics_view,
+    user_image_blob, info_for_display_batch, invite_users_bulk
 )
 
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
@@ -26,13 +28,21 @@ urlpatterns = [
     path('refresh/', MyTokenRefreshView.as_view(), name="token_refresh"),
     path('info/', UserInformationView.as_view()),
     path('infoForDisplay/', infoForDisplay, name="infoForDisplay"),
+    path('infoForDisplay/batch/', info_for_display_batch, name="infoForDisplay-batch"),
     path('meeting/', MeetingView.as_view()),
     path("invitations/send/", invite_user, name="invite-user"),
+    path("invitations/bulk/", invite_users_bulk, name="invite-users-bulk"),
     path("invitations/confirm/<uuid:token>/", confirm_invitation, name="confirm-invitation"),
     path("projects/<int:project_id>/invited-users/", invited_users_with_status),
     path("password/reset", reset_password),
     path('userImage/', UserImageView.as_view()),
+    path('images/<str:token>/', user_image_blob, name="user-image"),
     path('shifts/', ShiftView.as_view()),
     path('project-time/', ProjectTimeEntryView.as_view()),
     path('task-time/', TaskTimeEntryView.as_view()),
+    path('time/batch/', TimeEntryBatchView.as_view()),
+    path('sync/', SyncView.as_view()),
+    path('metrics/', metrics_view, name="metrics"),
+    path('reports/time/', TimeReportView.as_view()),
+    path('export/time-entries/', export_time_entries, name="export-time-entries"),
 ] 
\ No newline at end of file
@@ -1,15 +1,16 @@
-from django.core.mail import send_mail
 from django.conf import settings
 
-def send_invitation_email(invitation):
+from .outbox import enqueue
+
+
+def invitation_email(invitation):
     link = f"{settings.FRONTEND_URL}/invitations/confirm/{invitation.token}"
     subject = "Du wurdest zu einem Projekt eingeladen"
     message = f"Hallo,\n\nDu wurdest zu einem Projekt eingeladen.\nKlicke hier, um beizutreten:\n{link}"
+    return subject, message
 
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [invitation.to_user.email],
-        fail_silently=False,
-    )
+
+def send_invitation_email(invitation):
+    # queued in the outbox, delivered by `manage.py send_outbox`
+    subject, message = invitation_email(invitation)
+    enqueue(invitation.to_user.email, subject, message)
@@ -1,22 +1,28 @@
 from django.shortcuts import render
 from rest_framework.views import APIView
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import JsonResponse
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializer import MyTokenObtainPairSerializer, TaskSerializer, InvitationSerializer, ProjectSerializer, UserInformationSerializer, UserSelectSerializer, MeetingSerializer, UserImageSerializer, ShiftSerializer, ProjectTimeEntrySerializer, TaskTimeEntrySerializer
+from .serializer import BatchShiftSerializer, BatchProjectTimeEntrySerializer, BatchTaskTimeEntrySerializer
 from .models import Task, Project, Invitation, UserInformation, Meeting, UserImage, Shift, ProjectTimeEntry, TaskTimeEntry
 
 from django.shortcuts import get_object_or_404
+from django.core import signing
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Prefetch, Q, Subquery
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user_model
+import time
 from datetime import datetime, timezone
 from django.utils import timezone
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework.response import Response
-from .utils import send_invitation_email
+from .utils import invitation_email, send_invitation_email
 
 from django.utils import timezone
 from rest_framework_simplejwt.views import TokenRefreshView
@@ -24,8 +30,18 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from .utils import send_invitation_email
+from .pagination import paginated_response
+from .rollups import Span, day_bounds, user_timezone
+from . import buckets, rollups
+from .reports import GROUPINGS, PERIODS, time_report
+from .exports import CONTENT_TYPES, EXPORTS, export_queryset, stream_rows
+from .sync import decode_cursor as decode_sync_cursor, sync_changes
+from .conditional import conditional_get, matches, quarter_hour
+from .response_cache import cached_get
+from . import display, images, metrics, outbox, response_cache, search
+from django.utils.dateparse import parse_date, parse_datetime
 
-import base64
+from django.urls import reverse
 
 
 
@@ -81,19 +97,29 @@ class ProjectsView(APIView):
         project_id = request.query_params.get("project_id")
         project_name = request.query_params.get("project_name")
 
-        if project_id:
-            project = get_object_or_404(Project, id=project_id)
-            serializer = ProjectSerializer(project)
-            return Response(serializer.data)
+        projects = Project.objects.with_task_totals().with_timezone().prefetch_related(
+            Prefetch("invited_users", queryset=User.objects.only("id"))
+        )
 
-        if project_name:
-            project = get_object_or_404(Project, name=project_name)
-            serializer = ProjectSerializer(project)
-            return Response(serializer.data)
+        if project_name and not project_id:
+            scope = Project.objects.filter(name=project_name)
+            build = lambda: Response(ProjectSerializer(get_object_or_404(projects, name=project_name)).data)
+            return conditional_get(request, "projects", [scope], build, extra=quarter_hour())
 
-        projects = Project.objects.filter(creator=request.user) | request.user.invited_projects.all()
-        serializer = ProjectSerializer(projects.distinct(), many=True)
-        return Response(serializer.data)
+        if project_id:
+            scope = Project.objects.filter(id=project_id)
+            build = lambda: Response(ProjectSerializer(get_object_or_404(projects, id=project_id)).data)
+            versions = [("project", project_id)]
+        else:
+            scope = Project.objects.visible_to(request.user)
+            build = lambda: Response(ProjectSerializer(projects.visible_to(request.user), many=True).data)
+            versions = [("projects", request.user.pk)]
+
+        return cached_get(
+            request, "projects", versions,
+            lambda: conditional_get(request, "projects", [scope], build, extra=quarter_hour()),
+            extra=quarter_hour(),
+        )
 
     def post(self, request):
         serializer = ProjectSerializer(data=request.data)
@@ -128,9 +154,11 @@ class TaskView(APIView):
         priority = request.query_params.get("priority")
 
         if task_id:
-            task = get_object_or_404(Task, id=task_id)
-            serializer = TaskSerializer(task)
-            return Response(serializer.data)
+            tasks = Task.objects.filter(id=task_id)
+            build = lambda: Response(TaskSerializer(get_object_or_404(Task, id=task_id)).data)
+            return cached_get(
+                request, "tasks", [("task", task_id)], lambda: conditional_get(request, "tasks", [tasks], build)
+            )
 
         if priority:
             tasks = Task.objects.filter(priority=priority)
@@ -140,8 +168,10 @@ class TaskView(APIView):
             tasks = Task.objects.all()
 
         tasks = tasks.filter(assigned_to=request.user) 
-        serializer = TaskSerializer(tasks, many=True)
-        return Response(serializer.data)
+        build = lambda: paginated_response(request, tasks, TaskSerializer, ("id",))
+        return cached_get(
+            request, "tasks", [("tasks", request.user.pk)], lambda: conditional_get(request, "tasks", [tasks], build)
+        )
 
     def post(self, request):
         serializer = TaskSerializer(data=request.data)
@@ -233,35 +263,22 @@ class UserSearchView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        query = request.query_params.get("q")
+        query = request.query_params.get("q", "").strip()
         user_id = request.query_params.get("user_ID")
 
         if not query and not user_id:
             return Response({"error": "Query parameter 'q' or 'user_ID' is required"}, status=400)
 
-        users = User.objects.none()
-
-        if query:
-            users = User.objects.filter(
-                username__icontains=query
-            ) | User.objects.filter(
-                email__icontains=query
-            )
-
+        condition = search.user_match(query) if query else Q()
         if user_id:
-            users = users | User.objects.filter(id=user_id)
+            try:
+                condition |= Q(id=int(user_id))
+            except ValueError:
+                return Response({"error": "user_ID must be an integer"}, status=400)
 
-        users = users.distinct()
-
-        data = [
-            {
-                "id": user.id,
-                "username": user.username,
-                "email": user.email
-            }
-            for user in users
-        ]
-        return Response(data)
+        limit = search.search_limit(request.query_params.get("limit"))
+        users = search.rank_users(User.objects.filter(condition), query)[:limit]
+        return Response(list(users.values("id", "username", "email")))
 
 class UserInformationView(APIView):
     permission_classes = [IsAuthenticated]
@@ -322,17 +339,26 @@ class MeetingView(APIView):
         meeting_id = request.query_params.get("meeting_id")
 
         if meeting_id:
-            meeting = get_object_or_404(Meeting, id=meeting_id)
-            if meeting.creator != request.user and request.user not in meeting.invited_users.all():
-                return Response({"error": "Not authorized to view this meeting."}, status=403)
-            serializer = MeetingSerializer(meeting)
-            return Response(serializer.data)
+            build = lambda: self.get_meeting(request, meeting_id)
+            return cached_get(
+                request, "meetings", [("meeting", meeting_id)],
+                lambda: conditional_get(request, "meetings", [Meeting.objects.filter(id=meeting_id)], build),
+            )
 
         meetings = Meeting.objects.filter(
-            models.Q(creator=request.user) | models.Q(invited_users=request.user)
+            Q(creator=request.user) | Q(invited_users=request.user)
         ).distinct()
 
-        serializer = MeetingSerializer(meetings, many=True)
+        build = lambda: paginated_response(request, meetings, MeetingSerializer, ("from_date", "id"))
+        return cached_get(
+            request, "meetings", [("meetings", request.user.pk)], lambda: conditional_get(request, "meetings", [meetings], build)
+        )
+
+    def get_meeting(self, request, meeting_id):
+        meeting = get_object_or_404(Meeting, id=meeting_id)
+        if meeting.creator != request.user and request.user not in meeting.invited_users.all():
+            return Response({"error": "Not authorized to view this meeting."}, status=403)
+        serializer = MeetingSerializer(meeting)
         return Response(serializer.data)
 
     def post(self, request):
@@ -372,9 +398,28 @@ class MeetingView(APIView):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def list_invitable_users(request):
-    users = User.objects.exclude(id=request.user.id)
-    serializer = UserSelectSerializer(users, many=True)
-    return Response(serializer.data)
+    project_id = request.query_params.get("project_id")
+    query = request.query_params.get("q", "").strip()
+
+    project = None
+    if project_id:
+        try:
+            project = Project.objects.visible_to(request.user).filter(id=project_id).first()
+        except ValueError:
+            return Response({"error": "project_id must be an integer"}, status=400)
+        if not project:
+            return Response({"error": "Projekt nicht gefunden."}, status=404)
+
+    key = search.invitable_cache_key(request, project and project.id)
+    data = cache.get(key)
+    if data is None:
+        users = search.invitable_users(request.user, project)
+        if query:
+            users = users.filter(search.user_match(query))
+        users = users.order_by("username", "id")
+        data = paginated_response(request, users, UserSelectSerializer, ("username", "id")).data
+        cache.set(key, data, search.INVITABLE_CACHE_TIMEOUT)
+    return Response(data)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
@@ -404,6 +449,71 @@ def invite_user(request):
 
     return Response({"message": "Einladung gesendet"})
 
+BULK_INVITE_LIMIT = 200
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def invite_users_bulk(request):
+    if not isinstance(request.data, dict):
+        return Response({"error": "Body muss ein Objekt mit project_id und user_ids oder emails sein"}, status=400)
+    project_id = request.data.get("project_id")
+    user_ids = request.data.get("user_ids") or []
+    emails = request.data.get("emails") or []
+
+    if not project_id or not isinstance(user_ids, list) or not isinstance(emails, list) or not (user_ids or emails):
+        return Response({"error": "project_id und user_ids oder emails sind erforderlich"}, status=400)
+    if len(user_ids) + len(emails) > BULK_INVITE_LIMIT:
+        return Response({"error": f"Maximal {BULK_INVITE_LIMIT} Einladungen pro Anfrage"}, status=400)
+    try:
+        user_ids = {int(user_id) for user_id in user_ids}
+        project = Project.objects.visible_to(request.user).filter(id=project_id).first()
+    except (TypeError, ValueError):
+        return Response({"error": "user_ids und project_id müssen Zahlen sein"}, status=400)
+    if not project:
+        return Response({"error": "Projekt nicht gefunden"}, status=404)
+    emails = {str(email).strip().lower() for email in emails}
+
+    # one query resolves the users together with their membership and pending invitations;
+    # iexact compiles to UPPER(email) = UPPER(%s), which the UPPER(email) index from 0013 serves
+    wanted = Q(id__in=user_ids)
+    for email in emails:
+        wanted |= Q(email__iexact=email)
+    users = list(
+        User.objects.filter(wanted)
+        .annotate(
+            is_member=Exists(Project.invited_users.through.objects.filter(project=project, user=OuterRef("pk"))),
+            is_pending=Exists(Invitation.objects.filter(project=project, to_user=OuterRef("pk"), status="pending")),
+        )
+        .only("id", "email")
+    )
+
+    invited, skipped = [], []
+    for user in users:
+        if user.id in (request.user.id, project.creator_id) or user.is_member:
+            skipped.append({"id": user.id, "reason": "member"})
+        elif user.is_pending:
+            skipped.append({"id": user.id, "reason": "pending"})
+        else:
+            invited.append(user)
+
+    found_emails = {user.email.lower() for user in users}
+    not_found = sorted(user_ids - {user.id for user in users}) + sorted(emails - found_emails)
+
+    with transaction.atomic():
+        invitations = Invitation.objects.bulk_create([
+            Invitation(from_user=request.user, to_user=user, project=project) for user in invited
+        ])
+        outbox.enqueue_many((user.email, *invitation_email(invitation)) for user, invitation in zip(invited, invitations))
+    # bulk_create sends no post_save
+    transaction.on_commit(lambda: search.bump_invitable_version(project.id))
+
+    return Response({
+        "invited": [user.id for user in invited],
+        "skipped": skipped,
+        "not_found": not_found,
+    }, status=201 if invited else 200)
+
 @api_view(["GET"])
 def confirm_invitation(request, token):
     try:
@@ -420,28 +530,33 @@ def confirm_invitation(request, token):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def invited_users_with_status(request, project_id):
-    try:
-        project = Project.objects.get(id=project_id)
-    except Project.DoesNotExist:
+    project = Project.objects.visible_to(request.user).filter(id=project_id)
+    invitations = Invitation.objects.filter(project_id=project_id, to_user=OuterRef("pk"))
+    members = Project.invited_users.through.objects.filter(project_id=project_id, user=OuterRef("pk"))
+    # members plus pending invitees, each with the status of their latest invitation;
+    # empty unless the caller can see the project, so the common case stays one query
+    users = User.objects.annotate(
+        is_member=Exists(members),
+        invitation_status=Subquery(invitations.order_by("-timestamp", "-id").values("status")[:1]),
+    ).filter(
+        Exists(project),
+        Q(is_member=True)
+        | Q(id__in=Invitation.objects.filter(project_id=project_id, status="pending").values("to_user")),
+    ).order_by("username", "id").values("id", "email", "username", "is_member", "invitation_status")
+
+    result = [
+        {
+            "id": user["id"],
+            "email": user["email"],
+            "name": user["username"],
+            "invitation_status": user["invitation_status"] or "unbekannt",
+            "is_member": user["is_member"],
+        }
+        for user in users
+    ]
+    if not result and not project.exists():
         return Response({"error": "Projekt nicht gefunden."}, status=404)
 
-    invited_users = project.invited_users.all()
-
-    result = []
-    for user in invited_users:
-        try:
-            invitation = Invitation.objects.get(project=project, to_user=user)
-            status = invitation.status
-        except Invitation.DoesNotExist:
-            status = "unbekannt"
-
-        result.append({
-            "id": user.id,
-            "email": user.email,
-            "name": user.username,
-            "invitation_status": status
-        })
-
     return Response(result)
 
 @api_view(["POST"])
@@ -462,6 +577,22 @@ def reset_password(request):
     return Response({"message": "Passwort wurde erfolgreich geändert."})
 
 
+# Avatars in member lists are rendered at most this large
+AVATAR_SIZE = 64
+
+DISPLAY_BATCH_LIMIT = 200
+
+
+def parse_image_size(request, default=None):
+    value = request.query_params.get("size")
+    if value is None:
+        return default
+    size = int(value)
+    if size <= 0:
+        raise ValueError("size must be positive")
+    return size
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def infoForDisplay(request):
@@ -469,39 +600,159 @@ def infoForDisplay(request):
 
     if not userID:
         return Response({"error": "userID sind erforderlich."}, status=400)
+    try:
+        size = parse_image_size(request, AVATAR_SIZE)
+    except ValueError:
+        return Response({"error": "size must be a positive integer"}, status=400)
+
+    try:
+        info = display.display_info([int(userID)]).get(int(userID))
+    except ValueError:
+        info = None
+    if not info:
+        return Response({"detail": "No User matches the given query."}, status=404)
 
-    user = get_object_or_404(User, id=userID)
-    
-    profile_image = UserImage.objects.filter(user=user, type="profile").last()
     image_data = None
     
-    if profile_image:
-        base64_image = base64.b64encode(profile_image.image_data).decode('utf-8')
-        image_data = f"data:{profile_image.content_type};base64,{base64_image}"
+    if info["profile_image"]:
+        image_data = image_url(request, info["profile_image"], size)
 
     response_data = {
-        "email": user.email,
-        "username": user.username,
+        "email": info["email"],
+        "username": info["username"],
         "profile_image": image_data
     }
 
     return Response(response_data)
 
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def info_for_display_batch(request):
+    ids = request.query_params.get("ids", "")
+    try:
+        user_ids = list(dict.fromkeys(int(value) for value in ids.split(",") if value.strip()))
+        size = parse_image_size(request, AVATAR_SIZE)
+    except ValueError:
+        return Response({"error": "ids must be a comma-separated list of user ids, size a positive integer"}, status=400)
+    if not user_ids:
+        return Response({"error": "ids are required"}, status=400)
+    if len(user_ids) > DISPLAY_BATCH_LIMIT:
+        return Response({"error": f"at most {DISPLAY_BATCH_LIMIT} ids per request"}, status=400)
+
+    infos = display.display_info(user_ids)
+    return Response([
+        {
+            "id": info["id"],
+            "email": info["email"],
+            "username": info["username"],
+            "profile_image": image_url(request, info["profile_image"], size) if info["profile_image"] else None,
+        }
+        for info in (infos.get(user_id) for user_id in user_ids)
+        if info
+    ])
+
+def image_url(request, image, size=None):
+    url = reverse("user-image", args=[images.sign_url_token(image.sha256)])
+    variant = images.pick_variant(image.variant_sizes, size) if size else None
+    if variant:
+        url += f"?size={variant}"
+    return request.build_absolute_uri(url)
+
+
+# The signed, expiring link is the capability (plain <img> tags cannot send the JWT
+# header); the content hash behind it is only the storage key and ETag.
+@api_view(["GET"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def user_image_blob(request, token):
+    try:
+        digest, expires = images.unsign_url_token(token)
+    except (signing.BadSignature, ValueError):
+        return Response({"error": "Invalid or expired image link"}, status=403)
+    try:
+        wanted = parse_image_size(request)
+    except ValueError:
+        return Response({"error": "size must be a positive integer"}, status=400)
+
+    image = UserImage.objects.filter(sha256=digest).only("content_type", "size", "variant_sizes").first()
+    if not image:
+        return Response({"error": "Image not found"}, status=404)
+
+    headers = {
+        # the bytes behind a link never change, but the link stops working at `expires`
+        "Cache-Control": f"public, max-age={max(0, expires - int(time.time()))}, immutable",
+        "Accept-Ranges": "bytes",
+        "X-Content-Type-Options": "nosniff",
+    }
+    variant = images.pick_variant(image.variant_sizes, wanted) if wanted else None
+    if variant:
+        fmt = images.variant_format(request.META.get("HTTP_ACCEPT"))
+        path = images.variant_path(digest, variant, fmt)
+        headers["Vary"] = "Accept"
+        if not images.image_storage().exists(path):
+            # listed in variant_sizes but not on disk (lost or never written): serve the original
+            metrics.incr("images.variant_missing")
+            variant = None
+    if variant:
+        content_type = images.VARIANT_FORMATS[fmt][1]
+        etag = f'"{digest}-{variant}.{fmt}"'
+    else:
+        path = images.blob_path(digest)
+        content_type = image.content_type
+        etag = f'"{digest}"'
+    headers["ETag"] = etag
+    attachment = not images.is_inline(content_type)
+    if attachment:
+        # rows from before uploads were checked may hold anything; never render them on this origin
+        content_type = "application/octet-stream"
+        headers["Content-Disposition"] = f'attachment; filename="{digest}"'
+        headers["Content-Security-Policy"] = "sandbox"
+
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match and matches(etag, if_none_match):
+        return HttpResponse(status=304, headers=headers)
+
+    size = images.image_storage().size(path) if variant else image.size
+    byte_range = None
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range or if_range == etag:
+        try:
+            byte_range = images.parse_byte_range(request.META.get("HTTP_RANGE"), size)
+        except ValueError:
+            return HttpResponse(status=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range:
+        start, end = byte_range
+        return HttpResponse(
+            images.read_range(path, start, end),
+            status=206,
+            content_type=content_type,
+            headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"},
+        )
+    return FileResponse(
+        images.open_path(path), content_type=content_type, headers=headers, as_attachment=attachment, filename=digest
+    )
+
+
 class UserImageView(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
     def get(self, request):
         image_type = request.query_params.get("type")  # e.g. profile, background
+        try:
+            size = parse_image_size(request)
+        except ValueError:
+            return Response({"error": "size must be a positive integer"}, status=400)
+
         if image_type:
             image = UserImage.objects.filter(user=request.user, type=image_type).last()
             if not image:
                 return Response({"error": "Image not found"}, status=404)
             
-            # Return base64 encoded image for the frontend
-            base64_image = base64.b64encode(image.image_data).decode('utf-8')
             return Response({
-                "image": f"data:{image.content_type};base64,{base64_image}",
+                "image": image_url(request, image, size),
                 "type": image.type,
                 "uploaded_at": image.uploaded_at
             })
@@ -509,9 +760,8 @@ class UserImageView(APIView):
         images = UserImage.objects.filter(user=request.user)
         image_data = []
         for image in images:
-            base64_image = base64.b64encode(image.image_data).decode('utf-8')
             image_data.append({
-                "image": f"data:{image.content_type};base64,{base64_image}",
+                "image": image_url(request, image, size),
                 "type": image.type,
                 "uploaded_at": image.uploaded_at
             })
@@ -524,22 +774,29 @@ class UserImageView(APIView):
         if not file or not image_type:
             return Response({"error": "file and type are required"}, status=400)
 
-        # Read the binary data from the uploaded file
-        image_data = file.read()
-        content_type = file.content_type
-
-        # Save the image to the database
-        image = UserImage.objects.create(
-            user=request.user,
-            image_data=image_data,
-            content_type=content_type,
-            type=image_type
-        )
+        # the client's content type is not trusted: only images Pillow recognizes are accepted
+        content_type = images.detect_content_type(file)
+        if not content_type:
+            return Response({"error": "file must be a JPEG, PNG, GIF or WebP image"}, status=400)
+
+        # Store the bytes under their hash, only metadata goes to the database
+        with transaction.atomic():
+            digest, size = images.store_blob(file)
+            width, height, variant_sizes = images.build_variants(digest)
+
+            image = UserImage.objects.create(
+                user=request.user,
+                sha256=digest,
+                size=size,
+                width=width,
+                height=height,
+                variant_sizes=variant_sizes,
+                content_type=content_type,
+                type=image_type
+            )
 
-        # Return base64 encoded image for immediate use in frontend
-        base64_image = base64.b64encode(image_data).decode('utf-8')
         return Response({
-            "image": f"data:{content_type};base64,{base64_image}",
+            "image": image_url(request, image),
             "type": image.type,
             "uploaded_at": image.uploaded_at
         }, status=201)
@@ -569,26 +826,56 @@ class UserImageView(APIView):
         image.delete()
         return Response({"message": "Image deleted successfully."}, status=204)
 
+def parse_range_bound(value, tz, end=False):
+    """Parse a from/to query value; plain dates are whole local days, so `to` is inclusive."""
+    day = parse_date(value)
+    if day is not None:
+        start, next_start = day_bounds(day, tz)
+        return next_start if end else start
+
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(f"Invalid date: {value}")
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment, tz)
+
 class ShiftView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         shift_id = request.query_params.get('shift_id')
         of_day = request.query_params.get('of_day')
+        range_from = request.query_params.get('from')
+        range_to = request.query_params.get('to')
+
+        shifts = Shift.objects.filter(user=request.user).prefetch_related("project_entries", "task_entries")
+        # nested entries are part of the representation
+        scope = [
+            Shift.objects.filter(user=request.user),
+            ProjectTimeEntry.objects.filter(user=request.user),
+            TaskTimeEntry.objects.filter(user=request.user),
+        ]
 
         if shift_id:
-            shift = get_object_or_404(Shift, id=shift_id, user=request.user)
-            serializer = ShiftSerializer(shift)
-            return Response(serializer.data)
+            build = lambda: Response(ShiftSerializer(get_object_or_404(shifts, id=shift_id)).data)
+            return conditional_get(request, "shifts", scope, build)
 
         if of_day:
-            shifts = Shift.objects.filter(user=request.user, start_time__date=of_day)
-            serializer = ShiftSerializer(shifts, many=True)
-            return Response(serializer.data)
+            shifts = shifts.filter(start_time__date=of_day)
+            build = lambda: paginated_response(request, shifts, ShiftSerializer, ("start_time", "id"))
+            return conditional_get(request, "shifts", scope, build)
+
+        if range_from or range_to:
+            tz = user_timezone(request.user.id)
+            try:
+                if range_from:
+                    shifts = shifts.filter(start_time__gte=parse_range_bound(range_from, tz))
+                if range_to:
+                    shifts = shifts.filter(start_time__lt=parse_range_bound(range_to, tz, end=True))
+            except ValueError:
+                return Response({"error": "from/to must be ISO dates or datetimes"}, status=400)
         
-        shifts = Shift.objects.filter(user=request.user)
-        serializer = ShiftSerializer(shifts, many=True)
-        return Response(serializer.data)
+        build = lambda: paginated_response(request, shifts, ShiftSerializer, ("start_time", "id"))
+        return conditional_get(request, "shifts", scope, build)
 
     def post(self, request):
         serializer = ShiftSerializer(data=request.data)
@@ -643,8 +930,7 @@ class ProjectTimeEntryView(APIView):
         if shift_id:
             entries = entries.filter(shift_id=shift_id)
             
-        serializer = ProjectTimeEntrySerializer(entries, many=True)
-        return Response(serializer.data)
+        return paginated_response(request, entries, ProjectTimeEntrySerializer, ("start_time", "id"))
 
     def post(self, request):
         serializer = ProjectTimeEntrySerializer(data=request.data)
@@ -699,8 +985,7 @@ class TaskTimeEntryView(APIView):
         if shift_id:
             entries = entries.filter(shift_id=shift_id)
             
-        serializer = TaskTimeEntrySerializer(entries, many=True)
-        return Response(serializer.data)
+        return paginated_response(request, entries, TaskTimeEntrySerializer, ("start_time", "id"))
 
     def post(self, request):
         serializer = TaskTimeEntrySerializer(data=request.data)
@@ -736,3 +1021,206 @@ class TaskTimeEntryView(APIView):
         return Response(status=204)
 
 
+
+class TimeReportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        group_by = [key for key in request.query_params.get("group_by", "project").split(",") if key]
+        period = request.query_params.get("period", "day")
+        source = request.query_params.get("source", "task" if "task" in group_by else "project")
+        project_id = request.query_params.get("project_id")
+        range_from = request.query_params.get("from")
+        range_to = request.query_params.get("to")
+
+        if source not in GROUPINGS:
+            return Response({"error": "source must be 'project' or 'task'"}, status=400)
+        if period not in PERIODS:
+            return Response({"error": "period must be one of day, week, month"}, status=400)
+        unknown = [key for key in group_by if key not in GROUPINGS[source]]
+        if unknown:
+            return Response({"error": f"Cannot group {source} entries by {', '.join(unknown)}"}, status=400)
+
+        # buckets are whole local days of each entry's owner, so only dates can be honoured
+        try:
+            start = parse_date(range_from) if range_from else None
+            end = parse_date(range_to) if range_to else None
+        except ValueError:
+            start = end = None
+        if (range_from and start is None) or (range_to and end is None):
+            return Response({"error": "from/to must be ISO dates (YYYY-MM-DD)"}, status=400)
+
+        rows = time_report(request.user, source, group_by, period, project_id=project_id, start=start, end=end)
+        return Response({
+            "source": source,
+            "period": period,
+            "group_by": group_by,
+            "rows": rows,
+        })
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_time_entries(request):
+    kind = request.query_params.get("kind", "project")
+    output = request.query_params.get("output", "csv")
+    range_from = request.query_params.get("from")
+    range_to = request.query_params.get("to")
+
+    if kind not in EXPORTS:
+        return Response({"error": "kind must be one of project, task, shift"}, status=400)
+    if output not in CONTENT_TYPES:
+        return Response({"error": "output must be 'csv' or 'ndjson'"}, status=400)
+
+    rows = export_queryset(kind, request.user)
+    if range_from or range_to:
+        tz = user_timezone(request.user.id)
+        try:
+            if range_from:
+                rows = rows.filter(start_time__gte=parse_range_bound(range_from, tz))
+            if range_to:
+                rows = rows.filter(start_time__lt=parse_range_bound(range_to, tz, end=True))
+        except ValueError:
+            return Response({"error": "from/to must be ISO dates or datetimes"}, status=400)
+
+    response = StreamingHttpResponse(stream_rows(rows, kind, output), content_type=CONTENT_TYPES[output])
+    response["Content-Disposition"] = f'attachment; filename="{kind}-entries.{output}"'
+    return response
+
+class TimeEntryBatchView(APIView):
+    permission_classes = [IsAuthenticated]
+    max_items = 1000
+    sections = {
+        "shifts": BatchShiftSerializer,
+        "project_entries": BatchProjectTimeEntrySerializer,
+        "task_entries": BatchTaskTimeEntrySerializer,
+    }
+
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response({"error": "Body must be an object with shifts, project_entries and task_entries"}, status=400)
+        items = {name: request.data.get(name) or [] for name in self.sections}
+        if not all(isinstance(section, list) for section in items.values()):
+            return Response({"error": "shifts, project_entries and task_entries must be lists"}, status=400)
+        if sum(len(section) for section in items.values()) > self.max_items:
+            return Response({"error": f"A batch may contain at most {self.max_items} items"}, status=400)
+
+        results = {name: [] for name in self.sections}
+        valid = {name: [] for name in self.sections}
+        for name, serializer_class in self.sections.items():
+            for index, item in enumerate(items[name]):
+                serializer = serializer_class(data=item)
+                result = {"index": index, "ref": item.get("ref") if isinstance(item, dict) else None}
+                if serializer.is_valid():
+                    result["status"] = "valid"
+                    valid[name].append((result, serializer.validated_data))
+                else:
+                    result.update(status="error", errors=serializer.errors)
+                results[name].append(result)
+
+        def reject(result, field, message):
+            result.update(status="error", errors={field: [message]})
+
+        # resolve every reference with one query per model
+        shift_refs = set()
+        for result, data in valid["shifts"]:
+            ref = data.get("ref")
+            if ref is None:
+                continue
+            if ref in shift_refs:
+                reject(result, "ref", "Duplicate shift ref")
+            shift_refs.add(ref)
+
+        entries = valid["project_entries"] + valid["task_entries"]
+        shift_ids = set(Shift.objects.filter(
+            user=request.user, id__in={data["shift"] for _, data in entries if "shift" in data}
+        ).values_list("id", flat=True))
+        project_ids = set(Project.objects.filter(
+            id__in={data["project"] for _, data in valid["project_entries"]}
+        ).values_list("id", flat=True))
+        task_projects = dict(Task.objects.filter(
+            id__in={data["task"] for _, data in valid["task_entries"]}
+        ).values_list("id", "project_id"))
+
+        for result, data in entries:
+            if "shift" in data and data["shift"] not in shift_ids:
+                reject(result, "shift", "Shift not found")
+            elif "shift_ref" in data and data["shift_ref"] not in shift_refs:
+                reject(result, "shift_ref", "No shift with this ref in the batch")
+        for result, data in valid["project_entries"]:
+            if data["project"] not in project_ids:
+                reject(result, "project", "Project not found")
+        for result, data in valid["task_entries"]:
+            if data["task"] not in task_projects:
+                reject(result, "task", "Task not found")
+
+        if any(result["status"] == "error" for section in results.values() for result in section):
+            return Response(results, status=400)
+
+        with transaction.atomic():
+            shifts = Shift.objects.bulk_create([
+                Shift(user=request.user, start_time=data["start_time"], end_time=data.get("end_time"))
+                for _, data in valid["shifts"]
+            ])
+            shifts_by_ref = {}
+            for (result, data), shift in zip(valid["shifts"], shifts):
+                result.update(status="created", id=shift.id)
+                if data.get("ref") is not None:
+                    shifts_by_ref[data["ref"]] = shift.id
+
+            def shift_id(data):
+                return data["shift"] if "shift" in data else shifts_by_ref[data["shift_ref"]]
+
+            project_entries = ProjectTimeEntry.objects.bulk_create([
+                ProjectTimeEntry(
+                    user=request.user, shift_id=shift_id(data), project_id=data["project"],
+                    start_time=data["start_time"], end_time=data.get("end_time"), description=data["description"],
+                )
+                for _, data in valid["project_entries"]
+            ])
+            task_entries = TaskTimeEntry.objects.bulk_create([
+                TaskTimeEntry(
+                    user=request.user, shift_id=shift_id(data), task_id=data["task"],
+                    start_time=data["start_time"], end_time=data["end_time"],
+                )
+                for _, data in valid["task_entries"]
+            ])
+            for section, created in (("project_entries", project_entries), ("task_entries", task_entries)):
+                for (result, _), entry in zip(valid[section], created):
+                    result.update(status="created", id=entry.id)
+
+            # bulk_create skips the model signals, so rollups and buckets are updated in one pass here
+            spans = [
+                Span(request.user.id, entry.project_id, None, entry.start_time, entry.end_time)
+                for entry in project_entries
+            ] + [
+                Span(request.user.id, task_projects[entry.task_id], entry.task_id, entry.start_time, entry.end_time)
+                for entry in task_entries
+            ]
+            rollups.apply_spans(spans)
+            buckets.apply_spans(spans)
+            response_cache.bump_projects({span.project_id for span in spans})
+
+        return Response(results, status=201)
+
+class SyncView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        cursor = request.query_params.get("since")
+        since = None
+        if cursor:
+            try:
+                since = decode_sync_cursor(cursor)
+            except ValueError:
+                return Response({"error": "Invalid since cursor"}, status=400)
+
+        return Response(sync_changes(request.user, since))
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    data = metrics.snapshot()
+    pool = getattr(connection, "pool", None)
+    if pool is not None:
+        data["db_pool"] = pool.get_stats()
+    return Response(data)
@@ -84,6 +84,7 @@ CORS_ALLOW_HEADERS = [
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.RequestInstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -116,7 +117,7 @@ WSGI_APPLICATION = 'oponion_api.wsgi.application'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
 }
 
@@ -140,6 +141,10 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 FRONTEND_URL = "http://localhost:3000"
 
+# Requests above these budgets are logged as warnings by RequestInstrumentationMiddleware
+REQUEST_QUERY_BUDGET = int(os.getenv("REQUEST_QUERY_BUDGET", 25))
+REQUEST_TIME_BUDGET_MS = int(os.getenv("REQUEST_TIME_BUDGET_MS", 500))
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -193,6 +198,23 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# "user_images" holds uploaded images under their sha256; swap the backend
+# (e.g. an S3 storage class) via USER_IMAGE_STORAGE without touching the code.
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+    "user_images": {
+        "BACKEND": os.getenv("USER_IMAGE_STORAGE", "django.core.files.storage.FileSystemStorage"),
+        "OPTIONS": {
+            "location": os.getenv("USER_IMAGE_ROOT", os.path.join(MEDIA_ROOT, 'user_images')),
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,102 @@
+"""
+Production profile: `DJANGO_SETTINGS_MODULE=oponion_api.settings_production`.
+
+Keeps database connections open across requests instead of paying a fresh
+TLS handshake to Postgres on every request.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, SECRET_KEY
+
+DEBUG = os.getenv("DJANGO_DEBUG") == "1"
+SECRET_KEY = os.getenv("DJANGO_SECRET_KEY", SECRET_KEY)
+
+
+def env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+# Database
+# Each worker thread holds at most one connection, so the number of open connections
+# is WEB_CONCURRENCY x GUNICORN_THREADS; keep that below the server's max_connections.
+DB_CONN_MAX_AGE = env_int("DB_CONN_MAX_AGE", 600)
+DB_POOL_MIN_SIZE = env_int("DB_POOL_MIN_SIZE", 0)
+DB_POOL_MAX_SIZE = env_int("DB_POOL_MAX_SIZE", 0)
+
+_ssl_root_cert = os.getenv("DB_SSLROOTCERT", os.path.join(BASE_DIR, "prod-ca-2021.crt"))
+
+DATABASES = {
+    "default": {
+        **{key: value for key, value in DATABASES["default"].items() if key != "CERT"},
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+        # a connection the server dropped while idle is replaced instead of failing the request
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "sslmode": os.getenv("DB_SSLMODE", "require"),
+            "connect_timeout": env_int("DB_CONNECT_TIMEOUT", 5),
+            "keepalives": 1,
+            "keepalives_idle": 60,
+            **({"sslrootcert": _ssl_root_cert} if os.path.exists(_ssl_root_cert) else {}),
+        },
+    }
+}
+
+if DB_POOL_MAX_SIZE:
+    # Django's native pool needs psycopg 3 (`psycopg[pool]`); connections return to the
+    # pool after each request, so persistent connections are switched off.
+    DATABASES["default"]["ENGINE"] = "django.db.backends.postgresql"
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": DB_POOL_MIN_SIZE,
+        "max_size": DB_POOL_MAX_SIZE,
+        "timeout": env_int("DB_POOL_TIMEOUT", 10),
+    }
+
+
+# Cache
+# Response, display and auth caches are only coherent across workers with a shared backend.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+elif env_int("WEB_CONCURRENCY", 1) > 1:
+    # per-process caches would keep serving what another worker has already invalidated
+    raise ImproperlyConfigured("REDIS_URL is required when running more than one worker (WEB_CONCURRENCY > 1).")
+
+
+# Image storage
+# Uploaded images only live in the "user_images" storage (migration 0011 drops the old
+# database column). The instance's own disk is replaced on every deploy, so they need an
+# object storage backend (USER_IMAGE_STORAGE) or a persistent disk mounted at USER_IMAGE_ROOT.
+if os.getenv("USER_IMAGE_STORAGE", "django.core.files.storage.FileSystemStorage").endswith(
+    "FileSystemStorage"
+) and not os.getenv("USER_IMAGE_ROOT"):
+    raise ImproperlyConfigured(
+        "Set USER_IMAGE_STORAGE to an object storage backend or USER_IMAGE_ROOT to a persistent disk."
+    )
+
+
+# Logging
+# one JSON line per request from core.instrumentation
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core.instrumentation": {
+            "handlers": ["console"],
+            "level": os.getenv("REQUEST_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
@@ -0,0 +1,53 @@
+"""
+Offline test profile: `python manage.py test core --settings=oponion_api.settings_test`.
+
+Runs the suite against in-memory SQLite, without Postgres, SMTP or a .env file.
+"""
+
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import STORAGES
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+    }
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+
+# hashing cost dominates the login-heavy tests; LoginTests opts back into PBKDF2
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+STORAGES = {
+    **STORAGES,
+    "user_images": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": os.path.join(tempfile.gettempdir(), "oponion-test-images")},
+    },
+}
+
+# Request JSON lines and outbox errors are expected in the suite; the tests that check them
+# capture them with assertLogs, everything else would only reach stderr via the last-resort handler.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "null": {"class": "logging.NullHandler"},
+    },
+    "loggers": {
+        "core": {
+            "handlers": ["null"],
+            "propagate": False,
+        },
+    },
+}